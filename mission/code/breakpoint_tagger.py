@@ -4,37 +4,182 @@ Simple breakpoint tagger - just click to mark timestamps.
 """
 
 import argparse
-import json
+import bisect
 import sys
+import time
+from collections import OrderedDict
 from pathlib import Path
 
+import av
 import cv2
+import numpy as np
+import orjson
+
+# Consecutive seek presses within this window count as a held-key scrub,
+# which only needs keyframe accuracy; a trailing exact re-seek settles
+# on the final target once the presses stop.
+SCRUB_REPEAT_WINDOW = 0.3
+
+# Preview refresh rate; on high-FPS sources we still decode every frame
+# (timestamps stay accurate) but only pay the BGR conversion at this rate.
+PREVIEW_FPS = 30.0
+
+# Recently displayed frames kept for repeated scrubs (64 × h×w×3 bytes).
+FRAME_CACHE_SIZE = 64
+
+# Display window size; sources larger than this are downscaled on the
+# decoder side so imshow never blits more pixels than the window shows.
+DISPLAY_WIDTH = 1280
+DISPLAY_HEIGHT = 720
 
 
 class BreakpointTagger:
     def __init__(self, video_path: Path, output_json: Path):
         self.video_path = video_path
         self.output_json = output_json
-        self.cap = None
+        self.container = None
+        self.stream = None
+        self.time_base = None
+        self.fps = 0.0
+        self.duration = 0.0
+        self._frames = None
+        self._reformatter = av.video.reformatter.VideoReformatter()
+        self._bgr = None  # Preallocated display-size scratch buffer
+        self.display_size = None  # (width, height) computed once from source
+        self._last_time = None  # Timestamp of the last decoded frame
+        self.keyframes_sec = []  # Sorted keyframe timestamps
+        self._frame_cache = OrderedDict()  # frame index -> BGR ndarray (LRU)
         self.breakpoints = []  # List of timestamps
-        
+
+    def _open(self):
+        """Open the video with PyAV and cache stream properties."""
+        self.container = av.open(str(self.video_path))
+        self.stream = self.container.streams.video[0]
+        # Frame+slice threaded decode; the pull-based decode iterator keeps
+        # at most one frame in flight, so seeks and pause react instantly
+        self.stream.thread_type = "AUTO"
+        self.time_base = self.stream.time_base
+        self.fps = float(self.stream.average_rate) if self.stream.average_rate else 0.0
+        if self.container.duration is not None:
+            self.duration = self.container.duration / av.time_base
+        elif self.stream.duration is not None:
+            self.duration = float(self.stream.duration * self.time_base)
+
+        # Compute the source→display scale once; only ever downscale
+        src_w = self.stream.codec_context.width
+        src_h = self.stream.codec_context.height
+        scale = min(DISPLAY_WIDTH / src_w, DISPLAY_HEIGHT / src_h, 1.0)
+        # Even dimensions keep swscale on its fast path
+        self.display_size = (int(src_w * scale) // 2 * 2, int(src_h * scale) // 2 * 2)
+
+        # Index keyframes once (demux only, no decode) so scrubs can tell
+        # whether a target is in the current GOP or needs a container seek
+        for packet in self.container.demux(self.stream):
+            if packet.is_keyframe and packet.pts is not None:
+                self.keyframes_sec.append(float(packet.pts * self.time_base))
+        self.keyframes_sec.sort()
+
+        self.container.seek(0)
+        self._frames = self.container.decode(self.stream)
+
+    def _next_frame(self):
+        """Return the next decoded frame, or None at end of stream."""
+        try:
+            frame = next(self._frames)
+        except (StopIteration, av.error.EOFError):
+            return None
+        if frame.time is not None:
+            self._last_time = frame.time
+        return frame
+
+    def _scratch(self) -> np.ndarray:
+        """Preallocated display-size BGR buffer, shared across frames."""
+        if self._bgr is None:
+            disp_w, disp_h = self.display_size
+            self._bgr = np.empty((disp_h, disp_w, 3), dtype=np.uint8)
+        return self._bgr
+
+    def _frame_to_bgr(self, frame):
+        """Convert a frame for display, reusing recently converted frames."""
+        idx = -1
+        if frame.time is not None and self.fps > 0:
+            idx = int(round(frame.time * self.fps))
+        if idx in self._frame_cache:
+            self._frame_cache.move_to_end(idx)
+            return self._frame_cache[idx]
+
+        disp_w, disp_h = self.display_size
+        converted = self._reformatter.reformat(
+            frame, width=disp_w, height=disp_h, format='bgr24'
+        )
+        if idx >= 0:
+            # Cached frames need their own storage (the LRU keeps them alive)
+            bgr = converted.to_ndarray()
+            bgr.setflags(write=False)  # Cached frames are shared
+            self._frame_cache[idx] = bgr
+            if len(self._frame_cache) > FRAME_CACHE_SIZE:
+                self._frame_cache.popitem(last=False)
+            return bgr
+
+        # Frames without a usable timestamp go through the shared buffer
+        # instead of allocating a fresh ndarray per frame
+        bgr = self._scratch()
+        plane = converted.planes[0]
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(disp_h, plane.line_size)
+        np.copyto(bgr.reshape(disp_h, disp_w * 3), rows[:, :disp_w * 3])
+        return bgr
+
+    def jump_to(self, target_sec: float, exact: bool = False):
+        """
+        Seek to target_sec and return the frame there.
+
+        With exact=False this stops at the preceding keyframe (fast, good
+        enough while scrubbing); with exact=True it decodes forward until
+        the frame at or after target_sec.
+        """
+        target_sec = max(0.0, target_sec)
+        if self.duration > 0:
+            target_sec = min(target_sec, self.duration)
+
+        # If the target is ahead of the current position but still in the
+        # same GOP, decoding forward beats a container seek + flush
+        in_gop = False
+        if self.keyframes_sec and self._last_time is not None:
+            kf_idx = bisect.bisect_right(self.keyframes_sec, target_sec) - 1
+            if kf_idx >= 0:
+                in_gop = self.keyframes_sec[kf_idx] <= self._last_time <= target_sec
+
+        if not in_gop:
+            self.container.seek(
+                int(target_sec / self.time_base),
+                stream=self.stream,
+                any_frame=False,
+                backward=True,
+            )
+            self._frames = self.container.decode(self.stream)
+
+        frame = self._next_frame()
+        if not exact and not in_gop:
+            return frame
+
+        # Decode forward from the keyframe until we reach the target
+        while frame is not None and frame.time is not None and frame.time < target_sec:
+            frame = self._next_frame()
+        return frame
+
     def run(self):
         """Main tagging loop."""
-        self.cap = cv2.VideoCapture(str(self.video_path))
-        
-        if not self.cap.isOpened():
-            print(f"Error: Could not open video {self.video_path}")
+        try:
+            self._open()
+        except av.error.FFmpegError as e:
+            print(f"Error: Could not open video {self.video_path}: {e}")
             sys.exit(1)
-        
-        fps = self.cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps if fps > 0 else 0
-        
+
         print("\n" + "="*60)
         print("Breakpoint Tagger")
         print("="*60)
         print(f"Video: {self.video_path.name}")
-        print(f"Duration: {duration:.2f} seconds")
+        print(f"Duration: {self.duration:.2f} seconds")
         print("\nControls:")
         print("  SPACE - Pause/Resume")
         print("  'b'   - Mark breakpoint (click to save timestamp)")
@@ -43,95 +188,116 @@ class BreakpointTagger:
         print("  'd'   - Delete last breakpoint")
         print("  'q'   - Quit and save")
         print("="*60 + "\n")
-        
+
         window_name = "Breakpoint Tagger - Press 'q' to quit"
         cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-        cv2.resizeWindow(window_name, 1280, 720)
-        
-        frame_delay = int(1000 / fps) if fps > 0 else 33
+        cv2.resizeWindow(window_name, DISPLAY_WIDTH, DISPLAY_HEIGHT)
+
+        frame_delay = int(1000 / self.fps) if self.fps > 0 else 33
+        # Only convert every Nth decoded frame for display on high-FPS sources
+        display_every = max(1, round(self.fps / PREVIEW_FPS)) if self.fps > 0 else 1
         paused = False
-        
+        frame = None
+        display = None
+        frame_idx = 0
+        current_time = 0.0
+        last_seek_press = 0.0
+        pending_exact_seek = None
+
         while True:
-            ret, frame = self.cap.read()
-            if not ret:
-                # Loop back to start
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                continue
-            
-            current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-            current_time = current_frame / fps if fps > 0 else 0
-            
-            # Draw overlay
-            # overlay = frame.copy()
-            # cv2.rectangle(overlay, (10, 10), (500, 150), (0, 0, 0), -1)
-            # cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-            
-            # Display current time
-            # time_str = f"Time: {current_time:.2f}s / {duration:.2f}s"
-            # cv2.putText(frame, time_str, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # Display breakpoint count
-            # bp_count = f"Breakpoints: {len(self.breakpoints)}"
-            # cv2.putText(frame, bp_count, (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-            
-            # Display status
-            # status = "PAUSED" if paused else "Playing"
-            # cv2.putText(frame, status, (20, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-            
-            # Show breakpoints on timeline
-            if self.breakpoints:
-                last_bp = self.breakpoints[-1]
-                if abs(current_time - last_bp) < 0.5:  # Highlight if near breakpoint
-                    cv2.circle(frame, (640, 50), 20, (0, 255, 0), -1)
-            
-            cv2.imshow(window_name, frame)
-            
+            need_display = display is None
+            if not paused or frame is None:
+                frame = self._next_frame()
+                if frame is None:
+                    # Loop back to start
+                    frame = self.jump_to(0.0)
+                    if frame is None:
+                        break
+                frame_idx += 1
+                # Skip the BGR conversion for frames nobody will see
+                need_display = need_display or frame_idx % display_every == 0
+
+            if frame.time is not None:
+                current_time = frame.time
+
+            # Convert to BGR only when this tick actually shows a frame
+            if need_display:
+                display = self._frame_to_bgr(frame)
+
+                # Show breakpoints on timeline
+                if self.breakpoints:
+                    last_bp = self.breakpoints[-1]
+                    if abs(current_time - last_bp) < 0.5:  # Highlight if near breakpoint
+                        if display is not self._bgr:
+                            # Draw on the scratch buffer, not into the cache
+                            np.copyto(self._scratch(), display)
+                            display = self._bgr
+                        cv2.circle(display, (640, 50), 20, (0, 255, 0), -1)
+
+                cv2.imshow(window_name, display)
+
             # Handle keyboard input
             key = cv2.waitKey(frame_delay if not paused else 1) & 0xFF
-            
+
+            # A held scrub seeks by keyframe only; once the presses stop,
+            # settle on the exact frame of the last requested target
+            if (pending_exact_seek is not None
+                    and time.monotonic() - last_seek_press > SCRUB_REPEAT_WINDOW):
+                seeked = self.jump_to(pending_exact_seek, exact=True)
+                pending_exact_seek = None
+                if seeked is not None:
+                    frame = seeked
+                    display = None
+
             if key == ord('q'):
                 break
             elif key == ord(' '):  # Space - pause/resume
                 paused = not paused
             elif key == ord('b'):  # Mark breakpoint
-                self.breakpoints.append(current_time)
-                self.breakpoints.sort()  # Keep sorted
+                bisect.insort(self.breakpoints, current_time)  # Keep sorted
                 print(f"  → Breakpoint {len(self.breakpoints)}: {current_time:.2f}s")
-            elif key == ord('r'):  # Rewind 5 seconds
-                new_frame = max(0, current_frame - int(5 * fps))
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, new_frame)
-            elif key == ord('f'):  # Forward 5 seconds
-                new_frame = min(total_frames - 1, current_frame + int(5 * fps))
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, new_frame)
+            elif key in (ord('r'), ord('f')):  # Rewind/forward 5 seconds
+                # Rapid repeats (held key) only need keyframe accuracy
+                now = time.monotonic()
+                exact = (now - last_seek_press) > SCRUB_REPEAT_WINDOW
+                last_seek_press = now
+                offset = -5.0 if key == ord('r') else 5.0
+                target = current_time + offset
+                pending_exact_seek = None if exact else target
+                seeked = self.jump_to(target, exact=exact)
+                if seeked is not None:
+                    frame = seeked
+                    display = None  # Refresh the still view even when paused
             elif key == ord('d'):  # Delete last breakpoint
                 if self.breakpoints:
                     removed = self.breakpoints.pop()
                     print(f"  → Removed breakpoint: {removed:.2f}s")
                 else:
                     print("  No breakpoints to remove")
-        
-        self.cap.release()
+
+        self.container.close()
         cv2.destroyAllWindows()
-        
+
         # Save breakpoints
         self.save_breakpoints()
-    
+
     def save_breakpoints(self):
         """Save breakpoints to JSON file."""
         if not self.breakpoints:
             print("\nNo breakpoints marked. JSON not created.")
             return
-        
+
         self.output_json.parent.mkdir(parents=True, exist_ok=True)
-        
+
         data = {
             'video_path': str(self.video_path),
-            'breakpoints': sorted(self.breakpoints)
+            'breakpoints': self.breakpoints  # Kept sorted by insort
         }
-        
-        with open(self.output_json, 'w') as f:
-            json.dump(data, f, indent=2)
-        
+
+        self.output_json.write_bytes(
+            orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        )
+
         print(f"\n✓ Saved {len(self.breakpoints)} breakpoints to {self.output_json}")
         print("\nBreakpoints:")
         for i, bp in enumerate(self.breakpoints, 1):
@@ -153,17 +319,16 @@ def main():
         default=Path("breakpoints.json"),
         help="Output JSON file (default: breakpoints.json)"
     )
-    
+
     args = parser.parse_args()
-    
+
     if not args.video.exists():
         print(f"Error: Video file not found: {args.video}")
         sys.exit(1)
-    
+
     tagger = BreakpointTagger(args.video, args.output)
     tagger.run()
 
 
 if __name__ == "__main__":
     main()
-
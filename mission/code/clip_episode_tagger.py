@@ -5,14 +5,24 @@ Allows marking start_time, end_time, and color_class for each episode.
 """
 
 import csv
+import os
 import sys
 from pathlib import Path
 from typing import Optional
 
-from flask import Flask, jsonify, render_template, request, send_from_directory
+import orjson
+from flask import Flask, render_template, request, send_from_directory
+from werkzeug.utils import safe_join
 
 app = Flask(__name__)
 
+
+def ojson(data, status: int = 200):
+    """JSON response serialized with orjson (faster than flask.jsonify)."""
+    return app.response_class(
+        orjson.dumps(data), mimetype='application/json', status=status
+    )
+
 # Global data
 CLIPS_DIR: Optional[Path] = None
 OUTPUT_CSV: Optional[Path] = None
@@ -27,18 +37,29 @@ COLOR_TASKS = {
 }
 
 
+# get_clips() result, reused until the directory mtime changes
+_CLIPS_CACHE: dict = {'key': None, 'clips': []}
+
+
 def get_clips() -> list[dict]:
     """Get list of all clips."""
     if CLIPS_DIR is None or not CLIPS_DIR.exists():
         return []
     
-    clips = []
-    for clip_file in sorted(CLIPS_DIR.glob("*.mp4")):
-        clips.append({
-            'name': clip_file.name,
-            'path': clip_file.name,
-        })
+    cache_key = (str(CLIPS_DIR), CLIPS_DIR.stat().st_mtime_ns)
+    if _CLIPS_CACHE['key'] == cache_key:
+        return _CLIPS_CACHE['clips']
     
+    # scandir reuses the dirent data instead of stat()ing every entry
+    with os.scandir(CLIPS_DIR) as entries:
+        names = sorted(
+            entry.name for entry in entries
+            if entry.name.endswith('.mp4') and entry.is_file(follow_symlinks=False)
+        )
+    
+    clips = [{'name': name, 'path': name} for name in names]
+    _CLIPS_CACHE['key'] = cache_key
+    _CLIPS_CACHE['clips'] = clips
     return clips
 
 
@@ -52,34 +73,58 @@ def index():
 def get_clips_api():
     """Get all clips."""
     clips = get_clips()
-    return jsonify({'clips': clips, 'total': len(clips)})
+    return ojson({'clips': clips, 'total': len(clips)})
 
 
 @app.route('/api/clip/<clip_name>')
 def get_clip(clip_name: str):
     """Serve video clip file."""
     if CLIPS_DIR is None:
-        return jsonify({'error': 'Clips directory not set'}), 400
+        return ojson({'error': 'Clips directory not set'}, status=400)
     
-    clip_path = CLIPS_DIR / clip_name
-    if not clip_path.exists():
-        return jsonify({'error': 'Clip not found'}), 404
+    # safe_join rejects path traversal in the user-supplied name
+    clip_path = safe_join(str(CLIPS_DIR), clip_name)
+    if clip_path is None or not Path(clip_path).exists():
+        return ojson({'error': 'Clip not found'}, status=404)
     
-    return send_from_directory(str(CLIPS_DIR), clip_name, mimetype='video/mp4')
+    # conditional=True enables byte-range responses, so the browser's
+    # video element can scrub without re-downloading the whole file;
+    # max_age sets Cache-Control (conditional responses default to
+    # no-cache otherwise, which would defeat the hour of clip caching)
+    return send_from_directory(
+        CLIPS_DIR,
+        clip_name,
+        mimetype='video/mp4',
+        conditional=True,
+        etag=True,
+        max_age=3600,
+    )
+
+
+@app.after_request
+def add_streaming_headers(response):
+    """Advertise range support for the video element's scrubbing."""
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    return response
 
 
 @app.route('/api/save', methods=['POST'])
 def save_episodes():
     """Save episodes to CSV."""
-    data = request.json
+    try:
+        data = orjson.loads(request.get_data())
+    except orjson.JSONDecodeError:
+        return ojson({'error': 'Request body is not valid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return ojson({'error': 'Request body must be a JSON object'}, status=400)
     episodes = data.get('episodes', [])
     clip_name = data.get('clip_name', '')
     
     if OUTPUT_CSV is None:
-        return jsonify({'error': 'Output CSV path not set'}), 400
+        return ojson({'error': 'Output CSV path not set'}, status=400)
     
     if not episodes:
-        return jsonify({'error': 'No episodes to save'}), 400
+        return ojson({'error': 'No episodes to save'}, status=400)
     
     # Write CSV
     OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
@@ -87,22 +132,25 @@ def save_episodes():
     # Check if file exists - if so, append; otherwise create new
     file_exists = OUTPUT_CSV.exists()
     
-    with open(OUTPUT_CSV, 'a', newline='') as f:
+    # Build all rows first, then write the batch in one buffered flush
+    task_for = COLOR_TASKS.get
+    rows = [
+        (
+            clip_name,
+            f"{ep['start_time']:.3f}",
+            f"{ep['end_time']:.3f}",
+            task_for(ep.get('color', ''), '')
+        )
+        for ep in episodes
+    ]
+    
+    with open(OUTPUT_CSV, 'a', newline='', buffering=1 << 20) as f:
         writer = csv.writer(f)
         if not file_exists:
             writer.writerow(['clip_name', 'start_time', 'end_time', 'task'])
-        
-        for ep in episodes:
-            color = ep.get('color', '')
-            task = COLOR_TASKS.get(color, '')
-            writer.writerow([
-                clip_name,
-                f"{ep['start_time']:.3f}",
-                f"{ep['end_time']:.3f}",
-                task
-            ])
-    
-    return jsonify({
+        writer.writerows(rows)
+    
+    return ojson({
         'success': True,
         'episodes_saved': len(episodes),
         'output_file': str(OUTPUT_CSV)
@@ -134,8 +182,20 @@ if __name__ == '__main__':
     print(f"Clips directory: {CLIPS_DIR}")
     print(f"Output CSV: {OUTPUT_CSV}")
     print(f"Found {len(clips)} clips")
-    print("\nStarting Flask server...")
+    print("\nStarting server...")
     print("Open http://localhost:5000 in your browser")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    if os.environ.get('FLASK_ENV') == 'development':
+        app.run(debug=True, host='0.0.0.0', port=5000)
+    else:
+        # The Werkzeug debug server is single-threaded and re-stats
+        # templates per request; serve production traffic with waitress
+        app.config['TEMPLATES_AUTO_RELOAD'] = False
+        app.jinja_env.auto_reload = False
+        try:
+            from waitress import serve
+            serve(app, host='0.0.0.0', port=5000, threads=8)
+        except ImportError:
+            print("Warning: waitress not installed, using the Flask server")
+            app.run(host='0.0.0.0', port=5000, threaded=True)
 
@@ -6,17 +6,141 @@ Then creates a grid layout showing multiple episodes at once.
 """
 
 import argparse
+import concurrent.futures
+import os
 import subprocess
 import sys
 import tempfile
 from pathlib import Path
 from typing import Optional
 
+import av
 import pandas as pd
 
 
+# Probe results memoized on (path, size, mtime) so each file is probed once
+_VIDEO_INFO_CACHE: dict[tuple, dict] = {}
+
+# Preferred hardware H.264 encoders, in order; libx264 is the fallback
+_HW_ENCODERS = ('h264_nvenc', 'h264_vaapi', 'h264_amf')
+_ENCODER: Optional[str] = None
+
+
+def _encoder_works(encoder: str) -> bool:
+    """Trial-encode one black frame with the given encoder.
+
+    An encoder listed by `ffmpeg -encoders` was merely compiled in;
+    stock builds list nvenc/vaapi/amf on machines without the hardware,
+    where opening the device fails at encode time.
+    """
+    filter_suffix, output_args = encoder_args(encoder)
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+           '-f', 'lavfi', '-i', 'color=c=black:s=64x64:d=0.1']
+    if filter_suffix:
+        cmd += ['-vf', filter_suffix.lstrip(',')]
+    cmd += [*output_args, '-frames:v', '1', '-f', 'null', '-']
+    try:
+        subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            timeout=15
+        )
+        return True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired,
+            FileNotFoundError):
+        return False
+
+
+def pick_encoder() -> str:
+    """Pick the first usable hardware H.264 encoder, else libx264."""
+    global _ENCODER
+    if _ENCODER is not None:
+        return _ENCODER
+
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-encoders'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True
+        )
+        available = result.stdout
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        available = ''
+
+    _ENCODER = next(
+        (enc for enc in _HW_ENCODERS if enc in available and _encoder_works(enc)),
+        'libx264'
+    )
+    return _ENCODER
+
+
+def encoder_args(encoder: Optional[str] = None) -> tuple[str, list[str]]:
+    """
+    Return (filter_suffix, output_args) for the chosen encoder.
+
+    The filter suffix is appended to the end of the filter graph (VAAPI
+    needs the filtered frames uploaded to the GPU before encoding).
+    """
+    if encoder is None or encoder == 'auto':
+        encoder = pick_encoder()
+
+    if encoder == 'h264_nvenc':
+        return '', ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr',
+                    '-cq', '23', '-pix_fmt', 'yuv420p']
+    if encoder == 'h264_vaapi':
+        return ',format=nv12,hwupload', [
+            '-vaapi_device', '/dev/dri/renderD128', '-c:v', 'h264_vaapi',
+            '-qp', '23']
+    if encoder == 'h264_amf':
+        return '', ['-c:v', 'h264_amf', '-quality', 'balanced',
+                    '-rc', 'vbr_latency', '-pix_fmt', 'yuv420p']
+    return '', ['-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
+                '-pix_fmt', 'yuv420p']
+
+
 def get_video_info(video_path: Path) -> dict:
-    """Get video width, height, duration, and fps using ffprobe."""
+    """Get video width, height, duration, and fps using ffprobe (cached)."""
+    try:
+        st = video_path.stat()
+        cache_key = (str(video_path), st.st_size, st.st_mtime_ns)
+    except OSError:
+        cache_key = None
+    if cache_key is not None and cache_key in _VIDEO_INFO_CACHE:
+        return _VIDEO_INFO_CACHE[cache_key]
+
+    try:
+        # Container-level metadata only (moov atom): no decode, no fork
+        info = _read_video_info(video_path)
+    except (av.error.FFmpegError, OSError, IndexError):
+        info = _probe_video_info(video_path)
+    if cache_key is not None:
+        _VIDEO_INFO_CACHE[cache_key] = info
+    return info
+
+
+def _read_video_info(video_path: Path) -> dict:
+    """Read video width, height, duration, and fps in-process with PyAV."""
+    with av.open(str(video_path)) as container:
+        stream = container.streams.video[0]
+        duration = None
+        if container.duration is not None:
+            duration = container.duration / av.time_base
+        elif stream.duration is not None:
+            duration = float(stream.duration * stream.time_base)
+        return {
+            'width': stream.codec_context.width,
+            'height': stream.codec_context.height,
+            'fps': float(stream.average_rate) if stream.average_rate else 20.0,
+            'duration': duration
+        }
+
+
+def _probe_video_info(video_path: Path) -> dict:
+    """Probe video width, height, duration, and fps using ffprobe."""
     cmd = [
         'ffprobe',
         '-v', 'error',
@@ -60,12 +184,86 @@ def get_video_info(video_path: Path) -> dict:
     return {'width': 320, 'height': 240, 'fps': 20.0, 'duration': None}
 
 
+def _combine_views_av(
+    front_video: Path,
+    side_video: Path,
+    top_video: Path,
+    output_video: Path,
+    w: int,
+    h: int,
+    fps: float,
+    encoder: str
+) -> bool:
+    """
+    Combine three views in-process via libavfilter (no ffmpeg subprocess).
+
+    Builds the same scale+hstack graph as the subprocess path but drives
+    it with PyAV, saving the fork and filtergraph re-parse per call and
+    keeping decoder state inside the process.
+    """
+    graph = av.filter.Graph()
+    containers = [av.open(str(p)) for p in (side_video, top_video, front_video)]
+    try:
+        streams = [c.streams.video[0] for c in containers]
+        buffers = [graph.add_buffer(template=s) for s in streams]
+        hstack = graph.add('hstack', 'inputs=3')
+        sink = graph.add('buffersink')
+
+        for idx, buffer in enumerate(buffers):
+            scale = graph.add('scale', f'{w}:{h}')
+            buffer.link_to(scale)
+            scale.link_to(hstack, 0, idx)
+        hstack.link_to(sink)
+        graph.configure()
+
+        with av.open(str(output_video), 'w') as out:
+            out_stream = out.add_stream(encoder, rate=round(fps) if fps > 0 else 20)
+            out_stream.width = w * 3
+            out_stream.height = h
+            out_stream.pix_fmt = 'yuv420p'
+            if encoder == 'libx264':
+                out_stream.options = {'preset': 'fast', 'crf': '23'}
+
+            def _drain():
+                while True:
+                    try:
+                        filtered = sink.pull()
+                    except (av.error.BlockingIOError, av.error.EOFError):
+                        return
+                    filtered = filtered.reformat(format='yuv420p')
+                    for packet in out_stream.encode(filtered):
+                        out.mux(packet)
+
+            decoders = [c.decode(s) for c, s in zip(containers, streams)]
+            while True:
+                frames = [next(dec, None) for dec in decoders]
+                if any(frame is None for frame in frames):
+                    break
+                for buffer, frame in zip(buffers, frames):
+                    buffer.push(frame)
+                _drain()
+
+            for buffer in buffers:
+                buffer.push(None)  # Signal EOF to flush the graph
+            _drain()
+            for packet in out_stream.encode():
+                out.mux(packet)
+    finally:
+        for container in containers:
+            container.close()
+
+    return output_video.exists() and output_video.stat().st_size > 0
+
+
 def combine_three_views(
     front_video: Path,
     side_video: Path,
     top_video: Path,
     output_video: Path,
-    layout: str = 'horizontal'
+    layout: str = 'horizontal',
+    encoder: Optional[str] = None,
+    threads: Optional[int] = None,
+    intermediate: bool = False
 ) -> bool:
     """
     Combine three camera views into a single video.
@@ -76,14 +274,18 @@ def combine_three_views(
         top_video: Path to top camera video
         output_video: Path to output combined video
         layout: 'horizontal' (side-by-side) or 'grid' (2x2 with one empty)
+        encoder: H.264 encoder name, or None/'auto' to probe for hardware
+        threads: Encoder thread count (capped when jobs run in parallel)
+        intermediate: Output is throwaway (re-read by the grid stage);
+            encode with lossless FFV1 instead of H.264 to skip the
+            expensive encode + re-decode quality loss
     """
     output_video.parent.mkdir(parents=True, exist_ok=True)
     
-    # Get video info to determine dimensions
+    # Get video info to determine dimensions; the three camera clips share
+    # geometry, so probing the front view is enough
     front_info = get_video_info(front_video)
-    side_info = get_video_info(side_video)
-    top_info = get_video_info(top_video)
-    
+
     # Use the first available dimensions
     w = front_info.get('width', 320)
     h = front_info.get('height', 240)
@@ -113,16 +315,34 @@ def combine_three_views(
             f"[side][top][front][black]xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0"
         )
     
+    if layout == 'horizontal' and not intermediate:
+        # Drive the filter graph in-process when PyAV supports it; the
+        # subprocess below remains the fallback
+        resolved = encoder if encoder not in (None, 'auto') else pick_encoder()
+        try:
+            return _combine_views_av(
+                front_video, side_video, top_video, output_video,
+                w, h, fps, resolved
+            )
+        except (av.error.FFmpegError, ValueError, OSError) as e:
+            print(f"    PyAV filter graph failed ({e}), falling back to ffmpeg subprocess")
+
+    if intermediate:
+        # FFV1 is lossless and nearly free to encode; the next stage
+        # re-decodes this file, so H.264 here would be wasted work
+        filter_suffix, output_args = '', ['-c:v', 'ffv1', '-level', '3']
+    else:
+        filter_suffix, output_args = encoder_args(encoder)
+    if threads is not None:
+        output_args = output_args + ['-threads', str(threads)]
+
     cmd = [
         'ffmpeg',
         '-i', str(side_video),
         '-i', str(top_video),
         '-i', str(front_video),
-        '-filter_complex', filter_complex,
-        '-c:v', 'libx264',
-        '-preset', 'fast',
-        '-crf', '23',
-        '-pix_fmt', 'yuv420p',
+        '-filter_complex', filter_complex + filter_suffix,
+        *output_args,
         '-y',
         str(output_video)
     ]
@@ -146,7 +366,9 @@ def create_episode_grid(
     combined_videos: list[Path],
     output_video: Path,
     grid_cols: int = 3,
-    grid_rows: int = 3
+    grid_rows: int = 3,
+    encoder: Optional[str] = None,
+    clip_duration: float = 10.0
 ) -> bool:
     """
     Create a grid video showing multiple episodes at once.
@@ -156,6 +378,8 @@ def create_episode_grid(
         output_video: Path to output grid video
         grid_cols: Number of columns in grid
         grid_rows: Number of rows in grid
+        encoder: H.264 encoder name, or None/'auto' to probe for hardware
+        clip_duration: Seconds of each episode shown in the grid
     """
     if not combined_videos:
         print("Error: No videos to combine")
@@ -195,30 +419,32 @@ def create_episode_grid(
         inputs.append(f"-i {video}")
         layout_parts.append(f"{x_pos}_{y_pos}")
     
-    layout_str = "|".join(layout_parts)
-    
-    # Create black background
-    filter_complex = f"color=c=black:s={grid_width}x{grid_height}[bg];"
-    
+    # The background is pad 0 of the stack, so it needs the first layout
+    # slot; the video tiles are drawn over it in input order
+    layout_str = "|".join(["0_0"] + layout_parts)
+
+    # Create black background (bounded, so the stack reaches EOF)
+    filter_complex = f"color=c=black:s={grid_width}x{grid_height}:d={clip_duration}[bg];"
+
     # Scale all inputs
     for idx in range(len(combined_videos)):
         filter_complex += f"[{idx}:v]scale={w}:{h}[v{idx}];"
-    
+
     # Stack all videos
     filter_complex += f"[bg]"
     for idx in range(len(combined_videos)):
         filter_complex += f"[v{idx}]"
     filter_complex += f"xstack=inputs={len(combined_videos) + 1}:layout={layout_str}"
     
+    filter_suffix, output_args = encoder_args(encoder)
+
+    # Input-side -ss/-t so only the shown span of each clip is decoded
     cmd = [
         'ffmpeg',
-        *[arg for video in combined_videos for arg in ['-i', str(video)]],
-        '-filter_complex', filter_complex,
-        '-c:v', 'libx264',
-        '-preset', 'fast',
-        '-crf', '23',
-        '-pix_fmt', 'yuv420p',
-        '-t', '10',  # Limit to 10 seconds per grid view
+        *[arg for video in combined_videos
+          for arg in ['-ss', '0', '-t', str(clip_duration), '-i', str(video)]],
+        '-filter_complex', filter_complex + filter_suffix,
+        *output_args,
         '-y',
         str(output_video)
     ]
@@ -238,6 +464,128 @@ def create_episode_grid(
         return False
 
 
+def create_fused_grid(
+    episode_clips: list[dict],
+    output_video: Path,
+    layout: str = 'horizontal',
+    grid_cols: int = 3,
+    grid_rows: int = 3,
+    encoder: Optional[str] = None,
+    clip_duration: float = 10.0
+) -> bool:
+    """
+    Combine views and build the grid in a single ffmpeg invocation.
+
+    Each episode's three views are scaled and stacked into a tile inside
+    the same filter graph that assembles the final grid, so every source
+    clip is decoded once and encoded once (no intermediate H.264 files).
+
+    Args:
+        episode_clips: List of dicts with 'front', 'side', 'top' clip paths
+        output_video: Path to output grid video
+        layout: 'horizontal' (side-by-side) or 'grid' (2x2 with one empty)
+        grid_cols: Number of columns in grid
+        grid_rows: Number of rows in grid
+        encoder: H.264 encoder name, or None/'auto' to probe for hardware
+        clip_duration: Seconds of each episode shown in the grid
+    """
+    if not episode_clips:
+        print("Error: No episodes to combine")
+        return False
+
+    output_video.parent.mkdir(parents=True, exist_ok=True)
+
+    # All camera clips share geometry; probe one representative
+    info = get_video_info(episode_clips[0]['front'])
+    w = info.get('width', 320)
+    h = info.get('height', 240)
+
+    # Tile size after combining the three views
+    if layout == 'horizontal':
+        tile_w, tile_h = w * 3, h
+    else:
+        tile_w, tile_h = w * 2, h * 2
+
+    # Truncate to the grid; slots beyond the episode list are filled
+    # with black tiles below rather than repeating episodes
+    total_slots = grid_cols * grid_rows
+    episode_clips = list(episode_clips)[:total_slots]
+
+    input_args = []
+    filter_parts = []
+    layout_parts = []
+
+    for idx, clips in enumerate(episode_clips):
+        base = idx * 3
+        # Input-side -ss/-t so only the shown span of each clip is decoded
+        input_args += [
+            '-ss', '0', '-t', str(clip_duration), '-i', str(clips['side']),
+            '-ss', '0', '-t', str(clip_duration), '-i', str(clips['top']),
+            '-ss', '0', '-t', str(clip_duration), '-i', str(clips['front']),
+        ]
+
+        filter_parts.append(
+            f"[{base}:v]scale={w}:{h}[s{idx}];"
+            f"[{base + 1}:v]scale={w}:{h}[t{idx}];"
+            f"[{base + 2}:v]scale={w}:{h}[f{idx}];"
+        )
+        if layout == 'horizontal':
+            filter_parts.append(
+                f"[s{idx}][t{idx}][f{idx}]hstack=inputs=3[tile{idx}];"
+            )
+        else:
+            filter_parts.append(
+                # Bounded duration: an endless color source would keep
+                # xstack waiting for EOF long after the clips finish
+                f"color=c=black:s={w}x{h}:d={clip_duration}[blk{idx}];"
+                f"[s{idx}][t{idx}][f{idx}][blk{idx}]"
+                f"xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0[tile{idx}];"
+            )
+
+        row = idx // grid_cols
+        col = idx % grid_cols
+        layout_parts.append(f"{col * tile_w}_{row * tile_h}")
+
+    # Black tiles for the unused grid slots, bounded like the clips so
+    # the final stack still reaches EOF
+    for idx in range(len(episode_clips), total_slots):
+        filter_parts.append(
+            f"color=c=black:s={tile_w}x{tile_h}:d={clip_duration}[tile{idx}];"
+        )
+        row = idx // grid_cols
+        col = idx % grid_cols
+        layout_parts.append(f"{col * tile_w}_{row * tile_h}")
+
+    filter_complex = "".join(filter_parts)
+    filter_complex += "".join(f"[tile{idx}]" for idx in range(total_slots))
+    filter_complex += f"xstack=inputs={total_slots}:layout={'|'.join(layout_parts)}"
+
+    filter_suffix, output_args = encoder_args(encoder)
+
+    cmd = [
+        'ffmpeg',
+        *input_args,
+        '-filter_complex', filter_complex + filter_suffix,
+        *output_args,
+        '-y',
+        str(output_video)
+    ]
+
+    try:
+        subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        return output_video.exists() and output_video.stat().st_size > 0
+    except subprocess.CalledProcessError as e:
+        print(f"Error creating fused grid: {e}")
+        if e.stderr:
+            print(f"ffmpeg error: {e.stderr.decode()}")
+        return False
+
+
 def find_episode_clips(clips_dir: Path, episode_idx: int) -> dict:
     """Find clips for a specific episode from all three cameras."""
     cameras = ['front', 'side', 'top']
@@ -294,7 +642,27 @@ def main():
         default=None,
         help="Maximum number of episodes to include (default: all)"
     )
-    
+    parser.add_argument(
+        "--clip-duration",
+        type=float,
+        default=10.0,
+        help="Seconds of each episode to show in the grid (default: 10)"
+    )
+    parser.add_argument(
+        "--encoder",
+        type=str,
+        choices=['auto', 'libx264', 'h264_nvenc', 'h264_vaapi', 'h264_amf'],
+        default='auto',
+        help="H.264 encoder to use (default: auto-detect hardware, falling "
+             "back to libx264)"
+    )
+    parser.add_argument(
+        "--two-stage",
+        action="store_true",
+        help="Write intermediate combined videos per episode instead of "
+             "fusing combine+grid into a single ffmpeg invocation"
+    )
+
     args = parser.parse_args()
     
     if not args.clips_dir.exists():
@@ -327,60 +695,106 @@ def main():
     print(f"Found {len(episode_indices)} episodes")
     print(f"Episodes: {episode_indices[0]} to {episode_indices[-1]}")
     
-    # Create temporary directory for combined videos
-    with tempfile.TemporaryDirectory() as temp_dir:
+    # Collect episodes that have all three views
+    episode_clips = []
+    for ep_idx in episode_indices:
+        clips = find_episode_clips(args.clips_dir, ep_idx)
+        if not all(clips.values()):
+            missing = [cam for cam, path in clips.items() if path is None]
+            print(f"  Episode {ep_idx:03d}: Missing views {missing}, skipping")
+            continue
+        episode_clips.append(clips)
+
+    if not episode_clips:
+        print("Error: No episodes with all three views found")
+        sys.exit(1)
+
+    if args.output:
+        output_video = args.output
+    else:
+        output_video = args.clips_dir / "grid_view.mp4"
+
+    print(f"\nCreating grid view with {args.grid_cols}x{args.grid_rows} layout...")
+    print(f"Output: {output_video}")
+
+    if not args.two_stage:
+        # Single ffmpeg invocation: combine views and grid in one filter
+        # graph, so each source clip is decoded and encoded exactly once
+        success = create_fused_grid(
+            episode_clips,
+            output_video,
+            layout=args.layout,
+            grid_cols=args.grid_cols,
+            grid_rows=args.grid_rows,
+            encoder=args.encoder,
+            clip_duration=args.clip_duration
+        )
+
+        if success:
+            print(f"\n✓ Grid view created successfully: {output_video}")
+        else:
+            print(f"\n✗ Failed to create grid view")
+            sys.exit(1)
+        return
+
+    # Two-stage fallback: combined intermediate video per episode.
+    # Keep the throwaway intermediates in RAM when tmpfs is available
+    shm = Path('/dev/shm')
+    with tempfile.TemporaryDirectory(dir=shm if shm.is_dir() else None) as temp_dir:
         temp_path = Path(temp_dir)
         combined_videos = []
-        
+
         print(f"\nCombining three views for each episode...")
-        for ep_idx in episode_indices:
-            clips = find_episode_clips(args.clips_dir, ep_idx)
-            
-            # Check if we have all three views
-            if not all(clips.values()):
-                missing = [cam for cam, path in clips.items() if path is None]
-                print(f"  Episode {ep_idx:03d}: Missing views {missing}, skipping")
-                continue
-            
-            combined_video = temp_path / f"combined_episode_{ep_idx:03d}.mp4"
-            print(f"  Episode {ep_idx:03d}: Combining {clips['side'].name}, {clips['top'].name}, {clips['front'].name}...")
-            
-            success = combine_three_views(
-                clips['front'],
-                clips['side'],
-                clips['top'],
-                combined_video,
-                layout=args.layout
-            )
-            
-            if success:
-                combined_videos.append(combined_video)
-                print(f"    ✓ Created combined video")
-            else:
-                print(f"    ✗ Failed to combine views")
-        
+        # Each episode is independent; fill the cores with a process pool.
+        # Half the cores with -threads 2 per job, since the encoder is
+        # already multithreaded
+        max_workers = max(1, (os.cpu_count() or 2) // 2)
+        results = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for clips in episode_clips:
+                ep_idx = int(clips['front'].stem.split('_')[1])
+                # .nut container: mp4 cannot hold FFV1
+                combined_video = temp_path / f"combined_episode_{ep_idx:03d}.nut"
+                future = executor.submit(
+                    combine_three_views,
+                    clips['front'],
+                    clips['side'],
+                    clips['top'],
+                    combined_video,
+                    layout=args.layout,
+                    encoder=args.encoder,
+                    threads=2,
+                    intermediate=True
+                )
+                futures[future] = (ep_idx, combined_video)
+
+            for future in concurrent.futures.as_completed(futures):
+                ep_idx, combined_video = futures[future]
+                if future.result():
+                    results[ep_idx] = combined_video
+                    print(f"  Episode {ep_idx:03d}: ✓ Created combined video")
+                else:
+                    print(f"  Episode {ep_idx:03d}: ✗ Failed to combine views")
+
+        # Keep grid order deterministic regardless of completion order
+        combined_videos = [results[ep_idx] for ep_idx in sorted(results)]
+
         if not combined_videos:
             print("Error: No combined videos created")
             sys.exit(1)
-        
+
         print(f"\nCreated {len(combined_videos)} combined videos")
-        
-        # Create final grid video
-        if args.output:
-            output_video = args.output
-        else:
-            output_video = args.clips_dir / "grid_view.mp4"
-        
-        print(f"\nCreating grid view with {args.grid_cols}x{args.grid_rows} layout...")
-        print(f"Output: {output_video}")
-        
+
         success = create_episode_grid(
             combined_videos,
             output_video,
             grid_cols=args.grid_cols,
-            grid_rows=args.grid_rows
+            grid_rows=args.grid_rows,
+            encoder=args.encoder,
+            clip_duration=args.clip_duration
         )
-        
+
         if success:
             print(f"\n✓ Grid view created successfully: {output_video}")
         else:
@@ -4,113 +4,268 @@ Create video clips from episode boundaries in LeRobot dataset parquet files.
 """
 
 import argparse
+import concurrent.futures
+import hashlib
+import os
+import re
 import subprocess
 import sys
+import tempfile
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
+import pyarrow.parquet as pq
 
 
-def load_episodes_from_dataset(dataset_root: Path, camera: str = None) -> list[dict]:
+def _episodes_cache_key(dataset_root: Path, camera: str) -> str:
+    """Fingerprint of every source parquet file (path, mtime, size)."""
+    files = sorted(
+        list((dataset_root / "meta" / "episodes").rglob("*.parquet"))
+        + list((dataset_root / "data").rglob("*.parquet"))
+    )
+    stats = [(str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files]
+    return hashlib.blake2b(repr((camera, stats)).encode()).hexdigest()[:32]
+
+
+def _bounds_from_statistics(data_dir: Path) -> Optional[pd.DataFrame]:
+    """
+    Per-episode timestamp bounds from parquet row-group statistics alone.
+
+    When the data is written one episode per row group (the usual layout),
+    the footer metadata already carries min/max for episode_index and
+    timestamp, so the bounds come out without decoding a single column
+    chunk. Returns None when statistics are missing or a row group mixes
+    episodes; callers then fall back to scanning the data.
+    """
+    files = sorted(data_dir.rglob('*.parquet'))
+    if not files:
+        return None
+
+    mins, maxs = {}, {}
+    for path in files:
+        # Only the footer gets touched; the mmap avoids a read() copy
+        with pa.memory_map(str(path), 'r') as source:
+            meta = pq.ParquetFile(source).metadata
+        for rg_idx in range(meta.num_row_groups):
+            row_group = meta.row_group(rg_idx)
+            ep_stats = ts_stats = None
+            for col_idx in range(row_group.num_columns):
+                column = row_group.column(col_idx)
+                if column.path_in_schema == 'episode_index':
+                    ep_stats = column.statistics
+                elif column.path_in_schema == 'timestamp':
+                    ts_stats = column.statistics
+            if (
+                ep_stats is None or ts_stats is None
+                or not ep_stats.has_min_max or not ts_stats.has_min_max
+                or ep_stats.min != ep_stats.max
+            ):
+                return None
+            ep = int(ep_stats.min)
+            mins[ep] = min(mins.get(ep, ts_stats.min), ts_stats.min)
+            maxs[ep] = max(maxs.get(ep, ts_stats.max), ts_stats.max)
+
+    eps = sorted(mins)
+    return pd.DataFrame(
+        {
+            'start_fallback': [mins[ep] for ep in eps],
+            'end_fallback': [maxs[ep] for ep in eps],
+        },
+        index=pd.Index(eps, name='episode_index'),
+    )
+
+
+def load_episodes_from_dataset(dataset_root: Path, camera: str = None) -> pd.DataFrame:
     """
     Load episodes from dataset parquet files.
-    Returns list of episode dicts with start_time, end_time, and episode_index.
+
+    Returns a DataFrame with one row per episode and columns
+    episode_index, start_time, end_time, chunk_index, file_index
+    (the last two are nullable when no video metadata exists).
     """
     episodes_dir = dataset_root / "meta" / "episodes"
     if not episodes_dir.exists():
         raise ValueError(f"Episodes directory not found: {episodes_dir}")
+
+    # Re-runs with unchanged parquet files load the resolved bounds from a
+    # small feather file instead of re-scanning multi-GB parquet
+    cache_dir = dataset_root / ".cache"
+    try:
+        cache_file = cache_dir / f"episodes-{_episodes_cache_key(dataset_root, camera)}.feather"
+    except OSError:
+        cache_file = None
+    if cache_file is not None and cache_file.exists():
+        return pd.read_feather(cache_file)
+
+    # Only the columns actually read below; skips decoding stats blobs etc.
+    ep_cols = ['episode_index']
+    if camera:
+        ep_cols += [
+            f'videos/observation.images.{camera}/{field}'
+            for field in ('chunk_index', 'file_index', 'from_timestamp', 'to_timestamp')
+        ]
     
-    episode_dfs = []
-    for chunk_dir in sorted(episodes_dir.glob("chunk-*")):
-        for parquet_file in sorted(chunk_dir.glob("file-*.parquet")):
-            df = pd.read_parquet(parquet_file)
-            episode_dfs.append(df)
+    # Single multi-file Arrow scan: metadata parsed once, column chunks
+    # read in parallel, no per-file DataFrame + concat copies
+    episodes_ds = ds.dataset(
+        str(episodes_dir), format="parquet",
+        filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+    )
+    try:
+        episodes_table = episodes_ds.to_table(columns=ep_cols, use_threads=True)
+    except (KeyError, pa.lib.ArrowInvalid):
+        # Older metadata without the video columns
+        episodes_table = episodes_ds.to_table(use_threads=True)
     
-    if not episode_dfs:
+    if episodes_table.num_rows == 0:
         raise ValueError("No episode parquet files found")
     
-    episodes_df = pd.concat(episode_dfs, ignore_index=True)
+    episodes_df = episodes_table.to_pandas(split_blocks=True, self_destruct=True)
     
-    # Load data to get timestamps
+    # Episode bounds straight from row-group statistics when the layout
+    # allows it; only otherwise is the data actually read
     data_dir = dataset_root / "data"
-    data_frames = []
-    for chunk_dir in sorted(data_dir.glob("chunk-*")):
-        for parquet_file in sorted(chunk_dir.glob("file-*.parquet")):
-            df = pd.read_parquet(parquet_file)
-            data_frames.append(df)
-    
-    if not data_frames:
-        raise ValueError("No data parquet files found")
-    
-    data_df = pd.concat(data_frames, ignore_index=True)
-    data_df = data_df.sort_values('timestamp')
-    
-    # Get episode boundaries from timestamps
-    episodes = []
-    for _, ep_row in episodes_df.iterrows():
-        episode_idx = int(ep_row['episode_index'])
-        
-        # Get frames for this episode
-        ep_frames = data_df[data_df['episode_index'] == episode_idx]
-        if len(ep_frames) == 0:
-            continue
-        
-        # Get video timestamps from episode metadata (these are the actual video timestamps)
-        video_info = {}
-        start_time = None
-        end_time = None
-        
-        if camera:
-            video_chunk = ep_row.get(f'videos/observation.images.{camera}/chunk_index')
-            video_file = ep_row.get(f'videos/observation.images.{camera}/file_index')
-            video_from = ep_row.get(f'videos/observation.images.{camera}/from_timestamp')
-            video_to = ep_row.get(f'videos/observation.images.{camera}/to_timestamp')
-            
-            if pd.notna(video_chunk) and pd.notna(video_file):
-                video_info = {
-                    'chunk_index': int(video_chunk),
-                    'file_index': int(video_file),
-                }
-            
-            # Use video timestamps if available (these are the actual timestamps in the video file)
-            if pd.notna(video_from) and pd.notna(video_to):
-                start_time = float(video_from)
-                end_time = float(video_to)
-        
-        # Fallback to data timestamps if video timestamps not available
-        if start_time is None or end_time is None:
-            start_time = float(ep_frames['timestamp'].min())
-            end_time = float(ep_frames['timestamp'].max())
-        
-        episodes.append({
-            'episode_index': episode_idx,
-            'start_time': start_time,
-            'end_time': end_time,
-            'video_info': video_info,
-        })
-    
-    # Sort by episode index
-    episodes.sort(key=lambda x: x['episode_index'])
-    
+    bounds = _bounds_from_statistics(data_dir)
+    if bounds is None:
+        # Load data to get timestamps; project the two needed columns
+        data_table = ds.dataset(
+            str(data_dir), format="parquet",
+            filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+        ).to_table(columns=['episode_index', 'timestamp'], use_threads=True)
+
+        if data_table.num_rows == 0:
+            raise ValueError("No data parquet files found")
+
+        # No sort: the only consumer is the order-independent min/max below
+        data_df = data_table.to_pandas(
+            split_blocks=True, self_destruct=True, use_threads=True
+        )
+
+        # Per-episode timestamp bounds in one hashed groupby pass instead
+        # of filtering the whole data table once per episode
+        bounds = data_df.groupby('episode_index', sort=False)['timestamp'].agg(
+            start_fallback='min', end_fallback='max'
+        )
+
+    # Working frame with safe column names (video columns contain '/')
+    work = pd.DataFrame({'episode_index': episodes_df['episode_index']})
+    if camera:
+        for short_name, column in (
+            ('video_chunk', f'videos/observation.images.{camera}/chunk_index'),
+            ('video_file', f'videos/observation.images.{camera}/file_index'),
+            ('video_from', f'videos/observation.images.{camera}/from_timestamp'),
+            ('video_to', f'videos/observation.images.{camera}/to_timestamp'),
+        ):
+            work[short_name] = episodes_df[column] if column in episodes_df.columns else None
+
+    # Inner merge drops episodes with no frames (same as the old skip).
+    # Ordering once here means the result below comes out sorted and no
+    # post-hoc reorder of the full frame is needed
+    work = work.merge(bounds, left_on='episode_index', right_index=True, how='inner')
+    work = work.sort_values('episode_index', kind='stable', ignore_index=True)
+
+    # Get episode boundaries from timestamps; zip over plain NumPy arrays
+    # instead of allocating a row object per episode. NaN masks and casts
+    # happen once per column here, not once per row in the loop
+    idx_arr = work['episode_index'].to_numpy()
+    fb_start_arr = work['start_fallback'].to_numpy()
+    fb_end_arr = work['end_fallback'].to_numpy()
+    if camera:
+        has_video = (work['video_chunk'].notna() & work['video_file'].notna()).to_numpy()
+        has_video_ts = (work['video_from'].notna() & work['video_to'].notna()).to_numpy()
+        chunk_arr = work['video_chunk'].fillna(-1).astype(np.int64).to_numpy()
+        file_arr = work['video_file'].fillna(-1).astype(np.int64).to_numpy()
+        from_arr = pd.to_numeric(work['video_from'], errors='coerce').to_numpy(dtype=np.float64)
+        to_arr = pd.to_numeric(work['video_to'], errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        has_video = has_video_ts = np.zeros(len(work), dtype=bool)
+        chunk_arr = file_arr = from_arr = to_arr = np.zeros(len(work))
+
+    # Column-wise (SoA) result: video timestamps from the episode metadata
+    # when present (the actual timestamps in the video file), otherwise
+    # the per-episode data-timestamp bounds
+    episodes = pd.DataFrame({
+        'episode_index': idx_arr.astype(np.int32),
+        'start_time': np.where(has_video_ts, from_arr, fb_start_arr),
+        'end_time': np.where(has_video_ts, to_arr, fb_end_arr),
+        'chunk_index': pd.array(chunk_arr, dtype='Int32'),
+        'file_index': pd.array(file_arr, dtype='Int32'),
+    })
+    episodes.loc[~has_video, ['chunk_index', 'file_index']] = pd.NA
+
+    # Persist the resolved bounds for the next run with the same inputs
+    if cache_file is not None:
+        try:
+            cache_dir.mkdir(exist_ok=True)
+            episodes.to_feather(cache_file)
+        except OSError:
+            pass  # Read-only dataset dirs just skip the cache
+
     return episodes
 
 
+def probe_keyframes(video: Path) -> Optional[np.ndarray]:
+    """
+    Sorted keyframe timestamps of a video, or None when probing fails.
+
+    -skip_frame nokey makes ffprobe demux-only for everything between
+    keyframes, so this is one cheap sequential pass per source.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-skip_frame', 'nokey',
+        '-show_entries', 'frame=pts_time',
+        '-of', 'csv=print_section=0',
+        str(video),
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True, close_fds=False)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    times = [float(tok) for tok in result.stdout.decode().split() if tok]
+    if not times:
+        return None
+    return np.sort(np.asarray(times))
+
+
+def clip_is_fresh(input_video: Path, output_video: Path) -> bool:
+    """True when output_video exists, is non-empty, and postdates the source."""
+    return (
+        output_video.exists()
+        and output_video.stat().st_size > 0
+        and output_video.stat().st_mtime >= input_video.stat().st_mtime
+    )
+
+
 def create_clip(
     input_video: Path,
     output_video: Path,
     start_time: float,
     end_time: float,
+    force: bool = False,
 ) -> bool:
     """Create a video clip from start_time to end_time using ffmpeg."""
+    # Idempotent re-runs: a fresh output means no ffmpeg launch at all
+    if not force and clip_is_fresh(input_video, output_video):
+        return True
+
     output_video.parent.mkdir(parents=True, exist_ok=True)
     
     duration = end_time - start_time
     
-    # Use ffmpeg to extract clip (more reliable, supports more codecs)
+    # Use ffmpeg to extract clip (more reliable, supports more codecs).
+    # -ss before -i seeks via the container index instead of decoding
+    # and discarding everything up to start_time
     cmd = [
-        'ffmpeg',
-        '-i', str(input_video),
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
         '-ss', str(start_time),
+        '-i', str(input_video),
         '-t', str(duration),
         '-c', 'copy',  # Copy codec (fast, no re-encoding)
         '-avoid_negative_ts', 'make_zero',
@@ -119,20 +274,22 @@ def create_clip(
     ]
     
     try:
-        result = subprocess.run(
+        # Discard output in the kernel; nothing reads it on success
+        subprocess.run(
             cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            close_fds=False
         )
         return output_video.exists() and output_video.stat().st_size > 0
-    except subprocess.CalledProcessError as e:
+    except subprocess.CalledProcessError:
         # If copy fails, try re-encoding
         print(f"    Warning: Copy failed, trying re-encode...")
         cmd_reencode = [
-            'ffmpeg',
-            '-i', str(input_video),
+            'ffmpeg', '-nostdin', '-loglevel', 'error',
             '-ss', str(start_time),
+            '-i', str(input_video),
             '-t', str(duration),
             '-c:v', 'libx264',
             '-c:a', 'aac',
@@ -141,21 +298,214 @@ def create_clip(
             str(output_video)
         ]
         try:
-            subprocess.run(
-                cmd_reencode,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
-            )
+            # Capture stderr only here, where the message gets printed
+            subprocess.run(cmd_reencode, capture_output=True, check=True, close_fds=False)
             return output_video.exists() and output_video.stat().st_size > 0
-        except subprocess.CalledProcessError:
-            print(f"    Error: Failed to create clip")
+        except subprocess.CalledProcessError as e:
+            detail = e.stderr.decode(errors='replace').strip().splitlines()
+            print(f"    Error: Failed to create clip: {detail[-1] if detail else e}")
             return False
     except FileNotFoundError:
         print(f"    Error: ffmpeg not found. Please install ffmpeg.")
         return False
 
 
+def _has_audio_stream(video: Path) -> bool:
+    """True when the video carries at least one audio stream."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a',
+        '-show_entries', 'stream=index',
+        '-of', 'csv=p=0',
+        str(video),
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True, close_fds=False)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+    return bool(result.stdout.strip())
+
+
+def create_clips_batch(
+    input_video: Path,
+    jobs: list[tuple[float, float, Path]],
+) -> list[bool]:
+    """
+    Extract all clips from one video in a single ffmpeg invocation.
+
+    ffmpeg's multi-output mode opens and parses the input once and writes
+    each '-ss/-to' output group as the demuxer passes its range, instead
+    of spawning one process (and re-opening the source) per episode.
+
+    Args:
+        jobs: List of (start_time, end_time, output_video) tuples
+
+    Returns:
+        Per-job success flags, in the same order as jobs.
+    """
+    if not jobs:
+        return []
+
+    for _, _, output_video in jobs:
+        output_video.parent.mkdir(parents=True, exist_ok=True)
+
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', str(input_video)]
+    for start_time, end_time, output_video in jobs:
+        cmd += [
+            '-ss', str(start_time),
+            '-to', str(end_time),
+            '-c', 'copy',  # Copy codec (fast, no re-encoding)
+            '-avoid_negative_ts', 'make_zero',
+            str(output_video)
+        ]
+
+    try:
+        subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            close_fds=False
+        )
+    except subprocess.CalledProcessError:
+        # If copy fails, re-encode - one shared decode feeding every
+        # output through split/trim, instead of N decode passes
+        print(f"    Warning: Copy failed, trying re-encode...")
+        n = len(jobs)
+        has_audio = _has_audio_stream(input_video)
+        graph = ['[0:v]split=' + str(n) + ''.join(f'[v{i}]' for i in range(n))]
+        if has_audio:
+            graph.append('[0:a]asplit=' + str(n) + ''.join(f'[a{i}]' for i in range(n)))
+        for i, (start_time, end_time, _) in enumerate(jobs):
+            graph.append(
+                f'[v{i}]trim=start={start_time}:end={end_time},setpts=PTS-STARTPTS[ov{i}]'
+            )
+            if has_audio:
+                graph.append(
+                    f'[a{i}]atrim=start={start_time}:end={end_time},asetpts=PTS-STARTPTS[oa{i}]'
+                )
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+            '-i', str(input_video),
+            '-filter_complex', ';'.join(graph),
+        ]
+        for i, (_, _, output_video) in enumerate(jobs):
+            cmd += ['-map', f'[ov{i}]']
+            if has_audio:
+                cmd += ['-map', f'[oa{i}]', '-c:a', 'aac']
+            cmd += ['-c:v', 'libx264', '-preset', 'fast', str(output_video)]
+        try:
+            # Capture stderr only here, where the message gets printed
+            subprocess.run(cmd, capture_output=True, check=True, close_fds=False)
+        except subprocess.CalledProcessError as e:
+            detail = e.stderr.decode(errors='replace').strip().splitlines()
+            print(f"    Error: Failed to create clips: {detail[-1] if detail else e}")
+    except FileNotFoundError:
+        print(f"    Error: ffmpeg not found. Please install ffmpeg.")
+
+    return [
+        output_video.exists() and output_video.stat().st_size > 0
+        for _, _, output_video in jobs
+    ]
+
+
+def create_clips_segmented(
+    input_video: Path,
+    jobs: list[tuple[float, float, Path]],
+) -> Optional[list[bool]]:
+    """
+    Cut all clips from one video in a single sequential pass.
+
+    ffmpeg's segment muxer splits the file once at the given boundary
+    times while stream-copying, so the source is read front to back
+    exactly once instead of seeking per output range. Segments that fall
+    in the gaps between episodes are discarded.
+
+    Returns per-job success flags, or None when the jobs overlap or
+    share boundaries in a way the segment muxer cannot express (callers
+    fall back to the multi-output batch path).
+    """
+    if not jobs:
+        return []
+
+    # Every episode must map onto exactly one segment: its start and end
+    # have to be adjacent in the combined boundary list
+    times = sorted({t for start, end, _ in jobs for t in (start, end) if t > 0})
+    boundaries = [0.0] + times
+    seg_for_job = {}
+    for start, end, output_video in jobs:
+        try:
+            seg_idx = boundaries.index(start if start > 0 else 0.0)
+        except ValueError:
+            return None
+        if seg_idx + 1 >= len(boundaries) or boundaries[seg_idx + 1] != end:
+            return None  # Another boundary splits this episode
+        if seg_idx in seg_for_job:
+            return None  # Overlapping episodes
+        seg_for_job[seg_idx] = output_video
+
+    for _, _, output_video in jobs:
+        output_video.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=jobs[0][2].parent) as tmp_dir:
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+            '-i', str(input_video),
+            '-c', 'copy',
+            '-map', '0',
+            '-f', 'segment',
+            '-segment_times', ','.join(str(t) for t in times),
+            '-reset_timestamps', '1',
+            str(Path(tmp_dir) / 'seg_%05d.mp4'),
+        ]
+        try:
+            subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True,
+                close_fds=False
+            )
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+
+        # Keep the segments that correspond to episodes, drop the gaps
+        for seg_idx, output_video in seg_for_job.items():
+            seg_file = Path(tmp_dir) / f'seg_{seg_idx:05d}.mp4'
+            if seg_file.exists():
+                seg_file.replace(output_video)
+
+    return [
+        output_video.exists() and output_video.stat().st_size > 0
+        for _, _, output_video in jobs
+    ]
+
+
+_CHUNK_DIR_RE = re.compile(r'^chunk-(\d+)$')
+_VIDEO_FILE_RE = re.compile(r'^file-(\d+)\.mp4$')
+
+
+def build_video_index(dataset_root: Path, camera: str) -> dict[tuple[int, int], Path]:
+    """Map (chunk_index, file_index) to video paths in one directory walk."""
+    video_dir = dataset_root / "videos" / f"observation.images.{camera}"
+    index = {}
+    if not video_dir.exists():
+        return index
+    # os.scandir reuses the readdir d_type, so no extra stat per entry
+    with os.scandir(video_dir) as chunk_entries:
+        for chunk_entry in chunk_entries:
+            chunk_match = _CHUNK_DIR_RE.match(chunk_entry.name)
+            if not chunk_match or not chunk_entry.is_dir():
+                continue
+            chunk_idx = int(chunk_match.group(1))
+            with os.scandir(chunk_entry.path) as file_entries:
+                for file_entry in file_entries:
+                    file_match = _VIDEO_FILE_RE.match(file_entry.name)
+                    if file_match and file_entry.is_file():
+                        index[(chunk_idx, int(file_match.group(1)))] = Path(file_entry.path)
+    return index
+
+
 def find_video_file(dataset_root: Path, camera: str, chunk_idx: int = None, file_idx: int = None) -> Path:
     """Find video file in dataset."""
     video_dir = dataset_root / "videos" / f"observation.images.{camera}"
@@ -178,57 +528,130 @@ def find_video_file(dataset_root: Path, camera: str, chunk_idx: int = None, file
 
 def create_clips_from_episodes(
     dataset_root: Path,
-    episodes: list[dict],
+    episodes: pd.DataFrame,
     output_dir: Path,
     camera: str,
+    batch: bool = True,
+    max_workers: Optional[int] = None,
+    force: bool = False,
 ) -> None:
-    """Create clips for all episodes."""
+    """
+    Create clips for all episodes.
+
+    With batch=True (default) each source video is processed by a single
+    multi-output ffmpeg invocation. batch=False runs one ffmpeg per
+    episode instead - useful to isolate failures - with up to
+    max_workers concurrent processes.
+    """
     print(f"\nCreating clips for camera: {camera}")
     print(f"Output directory: {output_dir}")
     print(f"Number of episodes: {len(episodes)}\n")
     
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Group episodes by video file (if they have video_info)
+    # Group episodes by video file (if they have video metadata)
     episodes_by_video = {}
-    for ep in episodes:
-        if ep['video_info']:
-            key = (ep['video_info']['chunk_index'], ep['video_info']['file_index'])
-            if key not in episodes_by_video:
-                episodes_by_video[key] = []
-            episodes_by_video[key].append(ep)
+    for ep in episodes.itertuples(index=False):
+        if pd.notna(ep.chunk_index) and pd.notna(ep.file_index):
+            key = (int(ep.chunk_index), int(ep.file_index))
         else:
-            # Episodes without video_info go to default
-            if 'default' not in episodes_by_video:
-                episodes_by_video['default'] = []
-            episodes_by_video['default'].append(ep)
+            # Episodes without video metadata go to default
+            key = 'default'
+        episodes_by_video.setdefault(key, []).append(ep)
     
-    # Process each video file
-    for video_key, video_episodes in episodes_by_video.items():
-        if video_key == 'default':
-            # Use first available video file
-            video_path = find_video_file(dataset_root, camera)
-        else:
-            chunk_idx, file_idx = video_key
-            video_path = find_video_file(dataset_root, camera, chunk_idx, file_idx)
-        
-        print(f"Using video: {video_path.name}")
-        
-        for ep in video_episodes:
-            episode_idx = ep['episode_index']
-            start_time = ep['start_time']
-            end_time = ep['end_time']
-            duration = end_time - start_time
-            
-            output_file = output_dir / f"episode_{episode_idx:03d}.mp4"
-            
-            print(f"  Episode {episode_idx}: {start_time:.2f}s - {end_time:.2f}s ({duration:.2f}s) -> {output_file.name}")
-            
-            success = create_clip(video_path, output_file, start_time, end_time)
-            if success:
-                print(f"    ✓ Created")
+    # One directory walk indexes every video; per-video lookups are O(1)
+    # instead of re-globbing the chunk tree for each source
+    video_index = build_video_index(dataset_root, camera)
+
+    def iter_video_batches():
+        """Yield (video_path, episodes, jobs) per source as resolved."""
+        for video_key, video_episodes in episodes_by_video.items():
+            if video_key == 'default':
+                # Use first available video file
+                if video_index:
+                    video_path = video_index[min(video_index)]
+                else:
+                    video_path = find_video_file(dataset_root, camera)
             else:
-                print(f"    ✗ Failed")
+                video_path = video_index.get(video_key)
+                if video_path is None:
+                    chunk_idx, file_idx = video_key
+                    video_path = find_video_file(dataset_root, camera, chunk_idx, file_idx)
+
+            print(f"Using video: {video_path.name}")
+
+            # Snap each start back to the preceding keyframe: stream copy then
+            # begins on a clean GOP and the libx264 fallback almost never fires
+            keyframes = probe_keyframes(video_path)
+
+            jobs = []
+            pending_episodes = []
+            for ep in video_episodes:
+                episode_idx = int(ep.episode_index)
+                start_time = float(ep.start_time)
+                end_time = float(ep.end_time)
+                if keyframes is not None:
+                    kf_idx = np.searchsorted(keyframes, start_time, side='right') - 1
+                    if kf_idx >= 0:
+                        start_time = float(keyframes[kf_idx])
+                duration = end_time - start_time
+
+                output_file = output_dir / f"episode_{episode_idx:03d}.mp4"
+
+                # Outputs from a prior run that postdate the source are kept
+                if not force and clip_is_fresh(video_path, output_file):
+                    print(f"  Episode {episode_idx}: {output_file.name} up to date, skipping")
+                    continue
+
+                print(f"  Episode {episode_idx}: {start_time:.2f}s - {end_time:.2f}s ({duration:.2f}s) -> {output_file.name}")
+                jobs.append((start_time, end_time, output_file))
+                pending_episodes.append(ep)
+
+            yield video_path, pending_episodes, jobs
+
+    if batch:
+        def cut_video(video_path, jobs):
+            # Non-overlapping episodes cut in one sequential pass through
+            # the source; overlaps fall back to the multi-output batch
+            results = create_clips_segmented(video_path, jobs)
+            if results is None:
+                results = create_clips_batch(video_path, jobs)
+            return results
+
+        # Two batches in flight, fed straight from the generator: cutting
+        # of the first video starts while later sources are still being
+        # resolved and keyframe-probed, and while one video is being cut
+        # (or re-encoded on the fallback path) the next is already reading
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                (video_episodes, executor.submit(cut_video, video_path, jobs))
+                for video_path, video_episodes, jobs in iter_video_batches()
+            ]
+            for video_episodes, future in futures:
+                for ep, success in zip(video_episodes, future.result()):
+                    if success:
+                        print(f"    ✓ Created episode {ep.episode_index}")
+                    else:
+                        print(f"    ✗ Failed episode {ep.episode_index}")
+    else:
+        for video_path, _, jobs in iter_video_batches():
+            if not jobs:
+                # Every clip of this video is already fresh
+                continue
+            # One ffmpeg per episode, run concurrently; threads suffice
+            # because the work happens in the ffmpeg subprocesses
+            workers = max_workers or min(os.cpu_count() or 1, len(jobs))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(create_clip, video_path, output_file, start_time, end_time): output_file
+                    for start_time, end_time, output_file in jobs
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    output_file = futures[future]
+                    if future.result():
+                        print(f"    ✓ Created {output_file.name}")
+                    else:
+                        print(f"    ✗ Failed {output_file.name}")
     
     print(f"\n✓ Created clips in {output_dir}")
 
@@ -254,6 +677,23 @@ def main():
         default=None,
         help="Output directory for clips (default: dataset/clips/camera_name)"
     )
+    parser.add_argument(
+        "--no-batch",
+        action="store_true",
+        help="Run one ffmpeg process per episode instead of one batched "
+             "invocation per source video (isolates per-episode failures)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Concurrent ffmpeg processes with --no-batch (default: CPU count)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-create clips even when an up-to-date output already exists"
+    )
     
     args = parser.parse_args()
     
@@ -276,12 +716,15 @@ def main():
         traceback.print_exc()
         sys.exit(1)
     
-    if not episodes:
+    if episodes.empty:
         print("Error: No episodes found in dataset")
         sys.exit(1)
     
     # Create clips
-    create_clips_from_episodes(args.dataset, episodes, output_dir, args.camera)
+    create_clips_from_episodes(
+        args.dataset, episodes, output_dir, args.camera,
+        batch=not args.no_batch, max_workers=args.jobs, force=args.force,
+    )
 
 
 if __name__ == "__main__":
@@ -6,6 +6,8 @@ Creates a new dataset folder with only the specified episodes.
 """
 
 import argparse
+import concurrent.futures
+import functools
 import json
 import re
 import shutil
@@ -16,6 +18,11 @@ from typing import Optional
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
+import pyarrow.parquet as pq
 
 try:
     from moviepy.editor import VideoFileClip
@@ -23,34 +30,128 @@ try:
 except ImportError:
     MOVIEPY_AVAILABLE = False
 
+# Maps clip names like "episode_012.mp4" back to their episode index
+_EPISODE_RE = re.compile(r'episode_(\d+)')
 
-def load_all_data(dataset_root: Path) -> pd.DataFrame:
-    """Load all data from all parquet files."""
+
+@functools.lru_cache(maxsize=1)
+def _ffmpeg_available() -> bool:
+    """Whether an ffmpeg binary is on PATH; probed once per process."""
+    try:
+        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE, check=True)
+        return True
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return False
+
+
+# The only data columns create_new_dataset reads or writes back out;
+# projecting the scan to these skips decoding anything else
+DATA_COLUMNS = [
+    'timestamp', 'episode_index', 'index', 'frame_index',
+    'action', 'observation.state', 'task_index',
+]
+
+
+def load_all_data(
+    dataset_root: Path,
+    columns: Optional[list[str]] = None,
+    episode_indices: Optional[set[int]] = None,
+) -> pd.DataFrame:
+    """Load all data from all parquet files.
+
+    With episode_indices given, the scan is filtered to those episodes;
+    Arrow pushes the predicate down to row-group statistics so entire
+    row groups of unselected episodes are never read.
+    """
     data_dir = dataset_root / "data"
     if not data_dir.exists():
         raise ValueError(f"Data directory not found: {data_dir}")
-    
-    data_frames = []
-    for chunk_dir in sorted(data_dir.glob("chunk-*")):
-        for parquet_file in sorted(chunk_dir.glob("file-*.parquet")):
-            df = pd.read_parquet(parquet_file)
-            data_frames.append(df)
-    
-    if not data_frames:
+
+    # One multi-file Arrow scan: metadata parsed once, column chunks read
+    # in parallel, no per-file DataFrame + concat copies. Memory-mapped
+    # reads avoid the kernel->userspace copy of buffered I/O and let the
+    # page cache serve any re-reads for free.
+    dataset = ds.dataset(
+        str(data_dir), format="parquet",
+        filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+    )
+    scan_filter = None
+    if episode_indices:
+        scan_filter = pc.field('episode_index').isin(sorted(episode_indices))
+    try:
+        table = dataset.to_table(columns=columns, filter=scan_filter, use_threads=True)
+    except (KeyError, pa.lib.ArrowInvalid):
+        # Schema without some projected columns; fall back to everything
+        table = dataset.to_table(filter=scan_filter, use_threads=True)
+
+    if table.num_rows == 0:
         raise ValueError("No data files found")
-    
-    all_data = pd.concat(data_frames, ignore_index=True)
+
+    all_data = table.to_pandas(self_destruct=True)
     all_data = all_data.sort_values('timestamp')
     return all_data
 
 
+def load_episode_groups(
+    dataset_root: Path,
+    columns: Optional[list[str]] = None,
+    episode_indices: Optional[set[int]] = None,
+) -> tuple[dict[int, pd.DataFrame], int]:
+    """
+    Stream the data scan and bucket rows per source episode.
+
+    Unlike load_all_data this never materializes the whole dataset at
+    once: batches are read one at a time and appended to per-episode
+    buffers, so peak memory is the selected episodes plus one in-flight
+    batch. Returns (episode -> sorted frame, total row count).
+    """
+    data_dir = dataset_root / "data"
+    if not data_dir.exists():
+        raise ValueError(f"Data directory not found: {data_dir}")
+
+    dataset = ds.dataset(
+        str(data_dir), format="parquet",
+        filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+    )
+    scan_filter = None
+    if episode_indices:
+        scan_filter = pc.field('episode_index').isin(sorted(episode_indices))
+    def bucket_batches(cols):
+        grouped = {}
+        for batch in dataset.to_batches(columns=cols, filter=scan_filter, batch_size=65536):
+            eps = np.asarray(batch.column('episode_index'))
+            for ep in np.unique(eps):
+                part = batch.filter(pa.array(eps == ep))
+                grouped.setdefault(int(ep), []).append(part)
+        return grouped
+
+    try:
+        buffers = bucket_batches(columns)
+    except (KeyError, pa.lib.ArrowInvalid):
+        # Schema without some projected columns; fall back to everything
+        buffers = bucket_batches(None)
+
+    if not buffers:
+        raise ValueError("No data files found")
+
+    groups = {}
+    total_rows = 0
+    for ep, parts in buffers.items():
+        frame = pa.Table.from_batches(parts).to_pandas(self_destruct=True)
+        groups[ep] = frame.sort_values('timestamp')
+        total_rows += len(frame)
+    return groups, total_rows
+
+
 def get_video_duration(video_path: Path) -> float:
     """Get the actual duration of a video file in seconds using ffprobe."""
     cmd = [
         'ffprobe',
         '-v', 'error',
+        '-select_streams', 'v:0',
         '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
+        '-of', 'json',
         str(video_path)
     ]
     try:
@@ -60,37 +161,91 @@ def get_video_duration(video_path: Path) -> float:
             stderr=subprocess.PIPE,
             check=True
         )
-        duration = float(result.stdout.decode().strip())
-        return duration
-    except (subprocess.CalledProcessError, ValueError, FileNotFoundError):
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (subprocess.CalledProcessError, ValueError, KeyError, FileNotFoundError):
         return None
 
 
-def extract_video_segment(
+def copy_concatenated_video(
     input_video: Path,
     output_video: Path,
-    start_time: float,
-    end_time: float,
+    ranges: list[tuple[float, float]],
 ) -> bool:
-    """Extract a segment from a video file using ffmpeg."""
+    """
+    Cut and concatenate all episode ranges in one stream-copy pass.
+
+    The concat demuxer accepts per-entry inpoint/outpoint, so every
+    entry points at the same source and the demuxer performs the cuts
+    during the concat - no temp segments, no decode, no re-encode.
+    Cuts snap to keyframes; callers fall back to the select-filter
+    re-encode when this fails.
+    """
     output_video.parent.mkdir(parents=True, exist_ok=True)
-    
-    duration = end_time - start_time
-    
-    # Use ffmpeg to extract clip (more reliable, supports more codecs)
+
+    # The list is a handful of lines; pipe it straight to ffmpeg's stdin
+    # instead of writing, reading back, and unlinking a temp file. The
+    # explicit file: prefix keeps the demuxer from resolving entries
+    # relative to the pipe protocol of the list itself
+    concat_list = ''.join(
+        f"file 'file:{input_video.absolute()}'\ninpoint {start}\noutpoint {end}\n"
+        for start, end in ranges
+    )
+
     cmd = [
         'ffmpeg',
-        '-i', str(input_video),
-        '-ss', str(start_time),
-        '-t', str(duration),
+        '-f', 'concat',
+        '-safe', '0',
+        '-protocol_whitelist', 'pipe,file,fd',
+        '-i', 'pipe:0',
         '-c', 'copy',  # Copy codec (fast, no re-encoding)
-        '-avoid_negative_ts', 'make_zero',
-        '-y',  # Overwrite output file
+        '-y',
         str(output_video)
     ]
-    
+
     try:
-        result = subprocess.run(
+        subprocess.run(
+            cmd,
+            input=concat_list.encode(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        return output_video.exists() and output_video.stat().st_size > 0
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+def extract_concatenated_video(
+    input_video: Path,
+    output_video: Path,
+    ranges: list[tuple[float, float]],
+) -> bool:
+    """
+    Extract and concatenate all episode ranges in one ffmpeg invocation.
+
+    A select/between filter keeps only frames inside the given absolute
+    ranges and setpts recomputes timestamps, so the concatenated output
+    comes out of a single decode pass over the source - one process and
+    one source parse instead of one cut plus one concat per episode.
+    """
+    output_video.parent.mkdir(parents=True, exist_ok=True)
+
+    select_expr = '+'.join(f'between(t,{start},{end})' for start, end in ranges)
+    cmd = [
+        'ffmpeg',
+        '-i', str(input_video),
+        '-vf', f"select='{select_expr}',setpts=N/FRAME_RATE/TB",
+        '-vsync', 'vfr',
+        '-an',
+        '-c:v', 'libx264',
+        '-preset', 'fast',
+        '-threads', '0',  # Let the encoder use every core
+        '-y',
+        str(output_video)
+    ]
+
+    try:
+        subprocess.run(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -98,30 +253,8 @@ def extract_video_segment(
         )
         return output_video.exists() and output_video.stat().st_size > 0
     except subprocess.CalledProcessError as e:
-        # If copy fails, try re-encoding
-        print(f"    Warning: Copy failed, trying re-encode. Error: {e.stderr.decode().strip()}")
-        cmd_reencode = [
-            'ffmpeg',
-            '-i', str(input_video),
-            '-ss', str(start_time),
-            '-t', str(duration),
-            '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-preset', 'fast',
-            '-y',
-            str(output_video)
-        ]
-        try:
-            subprocess.run(
-                cmd_reencode,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
-            )
-            return output_video.exists() and output_video.stat().st_size > 0
-        except subprocess.CalledProcessError as e_reencode:
-            print(f"    Error: Failed to create clip even with re-encoding. Error: {e_reencode.stderr.decode().strip()}")
-            return False
+        print(f"    Error: Failed to extract video. Error: {e.stderr.decode().strip()}")
+        return False
     except FileNotFoundError:
         print(f"    Error: ffmpeg not found. Please install ffmpeg.")
         return False
@@ -182,16 +315,60 @@ def create_new_dataset(
     
     # Check if clip_name column exists
     has_clip_names = 'clip_name' in episodes_df.columns
+
+    # One vectorized regex pass maps every clip name to its source
+    # episode, instead of re.search per row in the loops below
+    if has_clip_names:
+        episodes_df['original_episode_idx'] = (
+            episodes_df['clip_name'].astype(str)
+            .str.extract(_EPISODE_RE).iloc[:, 0].astype('Int64')
+        )
     
     print(f"Found {len(episodes_df)} episodes to extract")
     if has_clip_names:
         unique_clips = episodes_df['clip_name'].nunique()
         print(f"Episodes from {unique_clips} different clips")
     
-    # Load all source data
+    # Columnar views of the CSV rows; the loops below index these arrays
+    # positionally instead of boxing every cell through iterrows
+    start_times = episodes_df['start_time'].to_numpy(dtype=np.float64)
+    end_times = episodes_df['end_time'].to_numpy(dtype=np.float64)
+    csv_tasks = episodes_df['task'].astype(str).str.strip().to_numpy()
+    if has_clip_names:
+        csv_clip_names = episodes_df['clip_name'].astype(str).to_numpy()
+        orig_ep_indices = episodes_df['original_episode_idx'].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+    else:
+        csv_clip_names = np.full(len(episodes_df), '', dtype=object)
+        orig_ep_indices = np.full(len(episodes_df), np.nan)
+
+    # Episodes actually referenced by the CSV; the data scan is pushed
+    # down to just these instead of loading every frame of every episode
+    required_eps = None
+    if has_clip_names:
+        extracted = episodes_df['original_episode_idx']
+        if len(extracted) > 0 and not extracted.isna().any():
+            # Rows we cannot map to an episode would need the timestamp
+            # fallback over the full data, so pushdown only applies when
+            # every row resolved
+            required_eps = set(int(ep) for ep in extracted)
+
+    # Load the referenced source data
     print("Loading source data...")
-    source_data = load_all_data(source_dataset)
-    print(f"Source data has {len(source_data)} frames")
+    source_data = None
+    ep_groups = {}
+    all_timestamps = np.empty(0)
+    if required_eps is not None:
+        # All CSV rows name their episode: stream the filtered scan into
+        # per-episode buffers instead of holding every frame at once
+        ep_groups, total_frames = load_episode_groups(
+            source_dataset, columns=DATA_COLUMNS, episode_indices=required_eps
+        )
+        print(f"Source data has {total_frames} frames")
+    else:
+        source_data = load_all_data(source_dataset, columns=DATA_COLUMNS)
+        print(f"Source data has {len(source_data)} frames")
     
     # Create output directory structure
     output_dataset.mkdir(parents=True, exist_ok=True)
@@ -208,44 +385,59 @@ def create_new_dataset(
             meta_dfs = []
             for chunk_dir in sorted(episodes_meta_dir.glob("chunk-*")):
                 for parquet_file in sorted(chunk_dir.glob("file-*.parquet")):
-                    df = pd.read_parquet(parquet_file)
+                    df = pq.read_table(str(parquet_file), memory_map=True).to_pandas()
                     meta_dfs.append(df)
             if meta_dfs:
                 episodes_meta = pd.concat(meta_dfs, ignore_index=True)
                 print(f"  Loaded metadata for {len(episodes_meta)} episodes")
-    
-    # Process each episode
+
+    # Point lookups instead of a full comparison over the metadata frame
+    # for every CSV row: one dict per camera keyed by episode_index
+    video_start_by_ep = {}
+    if episodes_meta is not None:
+        for camera in ('top', 'side', 'front'):
+            column = f'videos/observation.images.{camera}/from_timestamp'
+            if column in episodes_meta.columns:
+                video_start_by_ep[camera] = dict(
+                    zip(episodes_meta['episode_index'], episodes_meta[column])
+                )
+
+    # On the full-load path, split the frames per source episode once;
+    # inside each group the timestamps stay globally sorted, so episode
+    # ranges below reduce to a binary search instead of a full-table
+    # mask per CSV row (the streaming path already bucketed its groups)
+    if source_data is not None:
+        ep_groups = {ep: sub for ep, sub in source_data.groupby('episode_index', sort=False)}
+        all_timestamps = source_data['timestamp'].to_numpy()
+
+    # Process each episode; finished episodes are kept as Arrow tables
+    # so the final combine is a zero-copy concat, not a pandas rebuild
     all_extracted_data = []
+    next_index = 0
     episode_metadata = []
     task_map = {}
     next_task_index = 0
     
-    for csv_idx, row in episodes_df.iterrows():
-        clip_name = row.get('clip_name', '')
-        start_time = float(row['start_time'])
-        end_time = float(row['end_time'])
-        task = str(row['task']).strip()
+    for csv_idx in range(len(episodes_df)):
+        clip_name = csv_clip_names[csv_idx]
+        start_time = float(start_times[csv_idx])
+        end_time = float(end_times[csv_idx])
+        task = csv_tasks[csv_idx]
         
-        # Extract original episode index from clip name
+        # Original episode index from the vectorized extraction above
         original_episode_idx = None
-        if has_clip_names and clip_name:
-            import re
-            match = re.search(r'episode_(\d+)', clip_name)
-            if match:
-                original_episode_idx = int(match.group(1))
+        if not np.isnan(orig_ep_indices[csv_idx]):
+            original_episode_idx = int(orig_ep_indices[csv_idx])
         
         # Get absolute video timestamps for metadata (if we have episode metadata)
         absolute_video_start = start_time
         absolute_video_end = end_time
         if original_episode_idx is not None and episodes_meta is not None:
-            orig_ep = episodes_meta[episodes_meta['episode_index'] == original_episode_idx]
-            if len(orig_ep) > 0:
-                orig_ep = orig_ep.iloc[0]
-                orig_video_start = orig_ep.get('videos/observation.images.top/from_timestamp')
-                if pd.notna(orig_video_start):
-                    # CSV timestamps are relative to clip/episode, add original video start
-                    absolute_video_start = float(orig_video_start) + start_time
-                    absolute_video_end = float(orig_video_start) + end_time
+            orig_video_start = video_start_by_ep.get('top', {}).get(original_episode_idx)
+            if orig_video_start is not None and pd.notna(orig_video_start):
+                # CSV timestamps are relative to clip/episode, add original video start
+                absolute_video_start = float(orig_video_start) + start_time
+                absolute_video_end = float(orig_video_start) + end_time
         
         print(f"\nProcessing episode {csv_idx} from clip {clip_name}")
         if original_episode_idx is not None:
@@ -258,17 +450,21 @@ def create_new_dataset(
         # Filter data: timestamps in data are relative to each episode (start at 0 for each episode)
         # So we filter by episode_index AND timestamp within that episode
         if original_episode_idx is not None:
-            episode_data = source_data[
-                (source_data['episode_index'] == original_episode_idx) &
-                (source_data['timestamp'] >= start_time) & 
-                (source_data['timestamp'] < end_time)
-            ].copy()
-        else:
+            sub = ep_groups.get(original_episode_idx)
+            if sub is None:
+                episode_data = pd.DataFrame()
+            else:
+                sub_timestamps = sub['timestamp'].to_numpy()
+                lo = np.searchsorted(sub_timestamps, start_time, side='left')
+                hi = np.searchsorted(sub_timestamps, end_time, side='left')
+                episode_data = sub.iloc[lo:hi]
+        elif source_data is not None:
             # Fallback: try to find by timestamp only (less reliable)
-            episode_data = source_data[
-                (source_data['timestamp'] >= start_time) & 
-                (source_data['timestamp'] < end_time)
-            ].copy()
+            lo = np.searchsorted(all_timestamps, start_time, side='left')
+            hi = np.searchsorted(all_timestamps, end_time, side='left')
+            episode_data = source_data.iloc[lo:hi]
+        else:
+            episode_data = pd.DataFrame()
         
         if len(episode_data) == 0:
             print(f"  Warning: No data found for this time range, skipping")
@@ -280,25 +476,21 @@ def create_new_dataset(
             next_task_index += 1
         task_index = task_map[task]
         
-        # Reset indices for new episode
-        episode_data['episode_index'] = csv_idx  # Use CSV row index as episode index
-        episode_data['task_index'] = task_index
-        
-        # Reset frame_index to start from 0 for this episode
-        episode_data['frame_index'] = range(len(episode_data))
-        
-        # Reset timestamps to start from 0 for this episode (timestamps are relative to episode start)
+        # Rewrite the per-episode bookkeeping columns in one assign on
+        # the slice view: frame_index and timestamp restart at 0 for the
+        # new episode, index stays sequential across episodes, and the
+        # untouched wide columns (action, state) are never copied twice
+        n = len(episode_data)
+        base = next_index
         episode_start_timestamp = episode_data['timestamp'].min()
-        episode_data['timestamp'] = episode_data['timestamp'] - episode_start_timestamp
-        
-        # Reset index to be sequential
-        if len(all_extracted_data) == 0:
-            episode_data['index'] = range(len(episode_data))
-        else:
-            last_index = all_extracted_data[-1]['index'].max() + 1
-            episode_data['index'] = range(last_index, last_index + len(episode_data))
-        
-        all_extracted_data.append(episode_data)
+        episode_data = episode_data.assign(
+            episode_index=csv_idx,  # Use CSV row index as episode index
+            task_index=task_index,
+            frame_index=np.arange(n, dtype=np.int32),
+            timestamp=episode_data['timestamp'] - episode_start_timestamp,
+            index=np.arange(base, base + n, dtype=np.int64),
+        )
+        next_index += n
         
         # Create episode metadata
         episode_meta = {
@@ -307,8 +499,8 @@ def create_new_dataset(
             'length': len(episode_data),
             'data/chunk_index': 0,
             'data/file_index': 0,
-            'dataset_from_index': int(episode_data['index'].min()),
-            'dataset_to_index': int(episode_data['index'].max() + 1),
+            'dataset_from_index': base,
+            'dataset_to_index': base + n,
         }
         
         # Add video metadata (will be filled after video extraction)
@@ -320,180 +512,149 @@ def create_new_dataset(
         
         # Add stats (simplified - can compute full stats if needed)
         for key in ['action', 'observation.state']:
-            if key in episode_data.columns:
-                values = episode_data[key].apply(lambda x: np.array(x) if isinstance(x, (list, np.ndarray)) else x)
-                if len(values) > 0 and isinstance(values.iloc[0], np.ndarray):
-                    stacked = np.stack(values.values)
+            if key in episode_data.columns and len(episode_data) > 0:
+                first = episode_data[key].iloc[0]
+                if isinstance(first, (list, np.ndarray)):
+                    # One C-level list-of-lists -> 2D conversion instead of
+                    # a Python ndarray per row followed by np.stack
+                    stacked = np.asarray(episode_data[key].to_list(), dtype=np.float32)
                     episode_meta[f'stats/{key}/min'] = stacked.min(axis=0).tolist()
                     episode_meta[f'stats/{key}/max'] = stacked.max(axis=0).tolist()
                     episode_meta[f'stats/{key}/mean'] = stacked.mean(axis=0).tolist()
                     episode_meta[f'stats/{key}/std'] = stacked.std(axis=0).tolist()
         
         episode_metadata.append(episode_meta)
+        all_extracted_data.append(pa.Table.from_pandas(episode_data, preserve_index=False))
     
     if not all_extracted_data:
         raise ValueError("No episodes were extracted")
     
-    # Combine all extracted data
+    # Combine all extracted data; table concat shares the existing
+    # buffers instead of copying rows into a new frame
     print("\nCombining extracted data...")
-    combined_data = pd.concat(all_extracted_data, ignore_index=True)
+    combined_data = pa.concat_tables(all_extracted_data)
     
     # Save data parquet file
     data_file = output_dataset / "data" / "chunk-000" / "file-000.parquet"
     print(f"Saving data to: {data_file}")
-    combined_data.to_parquet(data_file, index=False)
-    
+
+    def write_data_parquet():
+        # All data columns are numeric or fixed-width lists: dictionary
+        # encoding would just burn CPU building useless dictionaries, and
+        # bounded row groups let chunked readers prune and stream
+        pq.write_table(
+            combined_data, data_file,
+            compression='zstd',
+            compression_level=3,
+            use_dictionary=False,
+            row_group_size=100_000,
+            data_page_size=1 << 20,
+        )
+
     # Save tasks
     tasks_data = {task: {'task_index': idx} for task, idx in task_map.items()}
     tasks_df = pd.DataFrame.from_dict(tasks_data, orient='index')
     tasks_file = output_dataset / "meta" / "tasks.parquet"
     print(f"Saving tasks to: {tasks_file}")
-    tasks_df.to_parquet(tasks_file)
-    
+
+    # The parquet writes (zstd compression, CPU-bound with the GIL
+    # released) run in the background while ffmpeg cuts videos below;
+    # the two phases touch disjoint files, so they fully overlap
+    write_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    write_futures = [
+        write_pool.submit(write_data_parquet),
+        write_pool.submit(tasks_df.to_parquet, tasks_file, compression='zstd'),
+    ]
+
     # Extract and concatenate video segments into a single video per camera
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        FFMPEG_AVAILABLE = True
-    except (FileNotFoundError, subprocess.CalledProcessError):
-        FFMPEG_AVAILABLE = False
-    
-    if FFMPEG_AVAILABLE:
+    if _ffmpeg_available():
         print("\nExtracting and concatenating video segments...")
         cameras = ['top', 'side', 'front']
         
-        # Calculate cumulative timestamps once (same for all cameras since they're synchronized)
-        cumulative_times = {}
-        cumulative_time = 0.0
-        for csv_idx, row in episodes_df.iterrows():
-            start_time = float(row['start_time'])
-            end_time = float(row['end_time'])
-            duration = end_time - start_time
-            cumulative_times[csv_idx] = cumulative_time
-            cumulative_time += duration
-        
-        for camera in cameras:
+        # Cumulative timestamps once, vectorized (same for all cameras
+        # since they're synchronized): durations come straight off the
+        # CSV columns, and each episode starts where the previous ended
+        durations = end_times - start_times
+        cumulative_times = np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+
+        def process_camera(camera):
+            """Extract one camera's episodes; returns metadata updates."""
             source_video = find_video_file(source_dataset, camera)
             if source_video is None:
                 print(f"  Warning: No video found for camera {camera}, skipping")
-                continue
-            
+                return None
+
             print(f"  Processing {camera} camera...")
             video_output_dir = output_dataset / "videos" / f"observation.images.{camera}" / "chunk-000"
             video_output_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Temporary directory for episode segments
-            temp_dir = video_output_dir / "temp_segments"
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            
-            segment_files = []
-            
-            # Extract each episode segment
-            for csv_idx, row in episodes_df.iterrows():
-                clip_name = row.get('clip_name', '')
-                start_time = float(row['start_time'])
-                end_time = float(row['end_time'])
-                duration = end_time - start_time
-                
+
+            # Absolute source ranges for every episode, in CSV order
+            ranges = []
+            for csv_idx in range(len(episodes_df)):
+                start_time = float(start_times[csv_idx])
+                end_time = float(end_times[csv_idx])
+
                 # Get absolute video timestamps from original dataset
                 absolute_video_start = start_time
                 absolute_video_end = end_time
-                if has_clip_names and clip_name and episodes_meta is not None:
-                    match = re.search(r'episode_(\d+)', clip_name)
-                    if match:
-                        original_episode_idx = int(match.group(1))
-                        orig_ep = episodes_meta[episodes_meta['episode_index'] == original_episode_idx]
-                        if len(orig_ep) > 0:
-                            orig_ep = orig_ep.iloc[0]
-                            orig_video_start = orig_ep.get(f'videos/observation.images.{camera}/from_timestamp')
-                            if pd.notna(orig_video_start):
-                                absolute_video_start = float(orig_video_start) + start_time
-                                absolute_video_end = float(orig_video_start) + end_time
-                
-                temp_segment = temp_dir / f"segment_{csv_idx:03d}.mp4"
-                print(f"    Extracting episode {csv_idx}: {absolute_video_start:.2f}s - {absolute_video_end:.2f}s")
-                
-                success = extract_video_segment(source_video, temp_segment, absolute_video_start, absolute_video_end)
-                if success:
-                    segment_files.append(temp_segment)
-                    
-                    # Get actual duration of extracted segment (may differ slightly due to frame boundaries)
-                    actual_duration = get_video_duration(temp_segment)
-                    if actual_duration is None:
-                        print(f"    Warning: Could not get video duration, using CSV duration")
-                        actual_duration = duration
-                    
-                    # Update episode metadata with cumulative timestamps in concatenated video
-                    # Video timestamps must be cumulative (where episode starts in concatenated video)
-                    # Data timestamps are relative to episode start (0 for each episode)
-                    # LeRobot adds data timestamp to video from_timestamp to get absolute position
-                    episode_start_time = cumulative_times[csv_idx]
-                    episode_metadata[csv_idx][f'videos/observation.images.{camera}/from_timestamp'] = episode_start_time
-                    episode_metadata[csv_idx][f'videos/observation.images.{camera}/to_timestamp'] = episode_start_time + actual_duration
-                    episode_metadata[csv_idx][f'videos/observation.images.{camera}/file_index'] = 0  # All in file-000
-                    
-                    # Update cumulative time for next episode using actual duration
-                    if csv_idx + 1 < len(episodes_df):
-                        cumulative_times[csv_idx + 1] = episode_start_time + actual_duration
-                else:
-                    print(f"    Warning: Failed to extract segment for episode {csv_idx}")
-            
-            # Concatenate all segments into a single video file
-            if segment_files:
-                output_video = video_output_dir / "file-000.mp4"
-                print(f"    Concatenating {len(segment_files)} segments into {output_video.name}...")
-                
-                # Create concat file list for ffmpeg
-                concat_file = temp_dir / "concat_list.txt"
-                with open(concat_file, 'w') as f:
-                    for seg_file in segment_files:
-                        f.write(f"file '{seg_file.absolute()}'\n")
-                
-                # Concatenate using ffmpeg
-                cmd = [
-                    'ffmpeg',
-                    '-f', 'concat',
-                    '-safe', '0',
-                    '-i', str(concat_file),
-                    '-c', 'copy',  # Copy codec (fast, no re-encoding)
-                    '-y',
-                    str(output_video)
-                ]
-                
-                try:
-                    subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-                    print(f"    ✓ Created concatenated video: {output_video.name}")
-                except subprocess.CalledProcessError as e:
-                    # If copy fails, try re-encoding
-                    print(f"    Warning: Copy failed, trying re-encode...")
-                    cmd_reencode = [
-                        'ffmpeg',
-                        '-f', 'concat',
-                        '-safe', '0',
-                        '-i', str(concat_file),
-                        '-c:v', 'libx264',
-                        '-c:a', 'aac',
-                        '-preset', 'fast',
-                        '-y',
-                        str(output_video)
-                    ]
-                    subprocess.run(cmd_reencode, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-                    print(f"    ✓ Created concatenated video (re-encoded): {output_video.name}")
-                
-                # Clean up temporary segments
-                for seg_file in segment_files:
-                    seg_file.unlink()
-                concat_file.unlink()
-                temp_dir.rmdir()
-            else:
-                print(f"    Warning: No segments extracted for {camera} camera")
-                temp_dir.rmdir()
-        
+                if episodes_meta is not None and not np.isnan(orig_ep_indices[csv_idx]):
+                    original_episode_idx = int(orig_ep_indices[csv_idx])
+                    orig_video_start = video_start_by_ep.get(camera, {}).get(original_episode_idx)
+                    if orig_video_start is not None and pd.notna(orig_video_start):
+                        absolute_video_start = float(orig_video_start) + start_time
+                        absolute_video_end = float(orig_video_start) + end_time
+
+                print(f"    [{camera}] Episode {csv_idx}: {absolute_video_start:.2f}s - {absolute_video_end:.2f}s")
+                ranges.append((absolute_video_start, absolute_video_end))
+
+            # One ffmpeg pass cuts and concatenates every episode;
+            # stream copy first, select-filter re-encode as fallback
+            output_video = video_output_dir / "file-000.mp4"
+            print(f"    Extracting {len(ranges)} {camera} episodes into {output_video.name}...")
+            if not copy_concatenated_video(source_video, output_video, ranges):
+                print(f"    Warning: Copy failed for {camera}, trying re-encode...")
+                if not extract_concatenated_video(source_video, output_video, ranges):
+                    print(f"    Warning: Video extraction failed for {camera} camera")
+                    return None
+            print(f"    ✓ Created concatenated video: {output_video.name}")
+
+            # One metadata probe of the finished file - rather than one
+            # per segment - to catch outputs that drifted from the CSV
+            total_duration = get_video_duration(output_video)
+            expected_duration = float(durations.sum())
+            if total_duration is not None and abs(total_duration - expected_duration) > 1.0:
+                print(f"    Warning: {camera} video is {total_duration:.2f}s, "
+                      f"expected {expected_duration:.2f}s from the CSV")
+
+            # Episode positions in the concatenated video follow from the
+            # analytic cumulative durations - no per-segment probing
+            updates = {}
+            for csv_idx in range(len(episodes_df)):
+                episode_start_time = float(cumulative_times[csv_idx])
+                updates[csv_idx] = {
+                    f'videos/observation.images.{camera}/from_timestamp': episode_start_time,
+                    f'videos/observation.images.{camera}/to_timestamp': episode_start_time + float(durations[csv_idx]),
+                    f'videos/observation.images.{camera}/file_index': 0,  # All in file-000
+                }
+            return updates
+
+        # The cameras read different sources and write different outputs,
+        # so the three single-pass pipelines run concurrently; the heavy
+        # work happens inside ffmpeg, so threads are all this needs
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(cameras)) as executor:
+            futures = {executor.submit(process_camera, camera): camera for camera in cameras}
+            for future in concurrent.futures.as_completed(futures):
+                updates = future.result()
+                if updates:
+                    for csv_idx, fields in updates.items():
+                        episode_metadata[csv_idx].update(fields)
+
         # Save episode metadata with updated video timestamps (after all cameras processed)
         episodes_df_meta = pd.DataFrame(episode_metadata)
         episodes_file = output_dataset / "meta" / "episodes" / "chunk-000" / "file-000.parquet"
         episodes_file.parent.mkdir(parents=True, exist_ok=True)
         print(f"\nSaving episode metadata with concatenated video timestamps...")
-        episodes_df_meta.to_parquet(episodes_file, index=False)
+        episodes_df_meta.to_parquet(episodes_file, index=False, compression='zstd')
     else:
         print("\nSkipping video extraction (ffmpeg not available)")
         print("  Video directories will be created but videos will not be extracted")
@@ -502,6 +663,12 @@ def create_new_dataset(
             video_output_dir = output_dataset / "videos" / f"observation.images.{camera}" / "chunk-000"
             video_output_dir.mkdir(parents=True, exist_ok=True)
     
+    # Join the background parquet writes; any write error surfaces here
+    # before the dataset is declared complete
+    for future in write_futures:
+        future.result()
+    write_pool.shutdown()
+
     # Update info.json with new dataset information
     source_info = source_dataset / "meta" / "info.json"
     if source_info.exists():
@@ -510,7 +677,7 @@ def create_new_dataset(
         
         # Update with new dataset statistics
         info['total_episodes'] = len(episode_metadata)
-        info['total_frames'] = len(combined_data)
+        info['total_frames'] = combined_data.num_rows
         info['total_tasks'] = len(task_map)
         
         # Set up splits - default to all train, but can be customized
@@ -550,7 +717,7 @@ def create_new_dataset(
     print(f"\n✓ Dataset extraction complete!")
     print(f"  Output dataset: {output_dataset}")
     print(f"  Episodes: {len(episode_metadata)}")
-    print(f"  Total frames: {len(combined_data)}")
+    print(f"  Total frames: {combined_data.num_rows}")
 
 
 def main():
@@ -589,11 +756,10 @@ def main():
         print(f"Error: Episodes CSV not found: {args.episodes_csv}")
         sys.exit(1)
     
-    # Check for ffmpeg
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    # Check for ffmpeg (cached, so create_new_dataset reuses this probe)
+    if _ffmpeg_available():
         print("ffmpeg found - video extraction will be available")
-    except (FileNotFoundError, subprocess.CalledProcessError):
+    else:
         print("Warning: ffmpeg not available. Video extraction will be skipped.")
         print("Install with: sudo apt-get install ffmpeg (or conda install -c conda-forge ffmpeg)")
         print("Continuing without video extraction...")